@@ -0,0 +1,54 @@
+"""
+Compares database size and full listing read latency with content compression off and on.
+
+    hatch run python benchmarks/bench_compression.py [entries] [words per entry]
+"""
+
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from wordspreader.ddl import DEFAULT_COMPRESS_THRESHOLD
+from wordspreader.persistence import DBPersistence
+
+VOCABULARY = ["zarya", "shield", "damage", "reload", "ball", "hammer", "spikes", "healing"]
+
+
+def make_template(rng: random.Random, words: int) -> str:
+    return " ".join(f"{rng.choice(VOCABULARY)}{rng.randrange(1000)}" for _ in range(words))
+
+
+def run(directory: Path, threshold: int, entries: int, words: int) -> tuple[int, float]:
+    db_file = directory / f"bench-{threshold}.sqlite3"
+    db = DBPersistence.from_file(db_file)
+    db.set_compression(threshold)
+    rng = random.Random(0)
+    for i in range(entries):
+        db.new_word(f"template {i}", make_template(rng, words), {f"tag{i % 10}"})
+    db.close()
+    db.engine.dispose()
+
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _word in db.get_words_filtered():
+            pass
+        timings.append(time.perf_counter() - start)
+    db.engine.dispose()
+    return db_file.stat().st_size, statistics.median(timings)
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, threshold in (("raw", 0), ("compressed", DEFAULT_COMPRESS_THRESHOLD)):
+            size, latency = run(Path(tmp), threshold, entries, words)
+            print(f"{label:>10}: {size / 1024:10.1f} KiB on disk, {latency * 1000:8.2f} ms to list")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Per keystroke latency of the quick copy palette's fuzzy matcher.
+
+    hatch run python benchmarks/bench_fuzzy.py [titles]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from wordspreader.fuzzy import FuzzyIndex
+
+SYLLABLES = ["za", "ry", "shi", "eld", "re", "lo", "ad", "wre", "ck", "ing", "ba", "tor", "gma"]
+
+
+def make_title(rng: random.Random) -> str:
+    return " ".join(
+        "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title()
+        for _ in range(rng.randint(2, 4))
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(0)
+    titles = list({make_title(rng) for _ in range(count)})
+
+    start = time.perf_counter()
+    index = FuzzyIndex(titles)
+    print(f"Indexed {len(index)} titles in {time.perf_counter() - start:.2f}s")
+
+    timings = []
+    for title in rng.sample(titles, 100):
+        query = title.lower()
+        if rng.random() < 0.5:
+            # Throw in a typo
+            i = rng.randrange(len(query))
+            query = query[:i] + "x" + query[i + 1 :]
+        # Typed one key at a time
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:end])
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    print(
+        f"{len(timings)} keystrokes: median {statistics.median(timings) * 1000:.2f}ms, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f}ms, max {timings[-1] * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Writes per second with several threads writing to one library at once, and a check that every
+write made it.
+
+    hatch run python benchmarks/bench_writers.py [writers] [words per writer]
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from wordspreader.persistence import DBPersistence
+
+
+def run(directory: Path, writers: int, words: int) -> tuple[float, int]:
+    db = DBPersistence.from_file(directory / f"bench-{writers}.sqlite3")
+    start = threading.Barrier(writers + 1)
+
+    def write(writer: int):
+        start.wait()
+        for i in range(words):
+            name = f"writer{writer} word{i}"
+            db.new_word(name, f"content {i}", {f"tag{i % 10}"})
+            db.update_word(name, content=f"changed {i}")
+            db.record_use(name)
+
+    with ThreadPoolExecutor(writers) as pool:
+        futures = [pool.submit(write, writer) for writer in range(writers)]
+        start.wait()
+        began = time.perf_counter()
+        for future in futures:
+            future.result()
+        db.usage.flush()
+        elapsed = time.perf_counter() - began
+
+    kept = sum(
+        1 for w in db.get_words_filtered() if w.content.startswith("changed") and w.copy_count == 1
+    )
+    lost = writers * words - kept
+    db.close()
+    db.engine.dispose()
+    # A new word and an update each, the uses go out in one batch
+    return writers * words * 2 / elapsed, lost
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as directory:
+        for count in sorted({1, writers // 2 or 1, writers}):
+            per_second, lost = run(Path(directory), count, words)
+            print(f"{count:>3} writers: {per_second:8.0f} writes/s, {lost} lost")
+            if lost:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,8 @@ def db_factory():
             for table in reversed(Base.metadata.sorted_tables):
                 session.execute(table.delete())
             session.commit()
+        # Cleared behind its back, so the title index would be stale
+        one_db_lol._title_index = None
         engine.echo = ENGINE_ECHO
         # Base.metadata.drop_all(engine)
         # Base.metadata.create_all(engine)
@@ -0,0 +1,73 @@
+import io
+import os
+from typing import TYPE_CHECKING
+
+from pytest import raises
+
+from tests.test_query_plans import captured_statements
+
+if TYPE_CHECKING:
+    from wordspreader.persistence import DBPersistence
+
+
+def test_round_trip_in_chunks(db_factory):
+    db: "DBPersistence" = db_factory()
+    db.new_word("word1", "content", set())
+    data = os.urandom(300_000)
+    attachment_id = db.add_attachment("word1", "map.png", io.BytesIO(data), len(data))
+    (attachment,) = db.list_attachments("word1")
+    assert attachment.id == attachment_id
+    assert (attachment.filename, attachment.size) == ("map.png", 300_000)
+    assert attachment.media_type == "image/png"
+    chunks = list(db.open_attachment(attachment_id, chunk_size=64 * 1024))
+    assert len(chunks) == 5
+    assert max(len(c) for c in chunks) == 64 * 1024
+    out = io.BytesIO()
+    assert db.export_attachment(attachment_id, out) == len(data)
+    assert out.getvalue() == data
+
+
+def test_files_and_empty_files(db_factory, tmp_path):
+    db: "DBPersistence" = db_factory()
+    db.new_word("word1", "content", set())
+    (tmp_path / "notes.txt").write_text("some notes")
+    (tmp_path / "empty.bin").write_bytes(b"")
+    notes = db.add_attachment_file("word1", tmp_path / "notes.txt")
+    empty = db.add_attachment_file("word1", tmp_path / "empty.bin")
+    assert b"".join(db.open_attachment(notes)) == b"some notes"
+    assert b"".join(db.open_attachment(empty)) == b""
+    db.delete_attachment(notes)
+    assert [a.filename for a in db.list_attachments("word1")] == ["empty.bin"]
+
+
+def test_short_streams_and_missing_things(db_factory):
+    db: "DBPersistence" = db_factory()
+    db.new_word("word1", "content", set())
+    with raises(ValueError):
+        db.add_attachment("word1", "short.bin", io.BytesIO(b"abc"), 10)
+    assert db.list_attachments("word1") == [], "A failed write leaves nothing behind"
+    with raises(KeyError):
+        db.add_attachment("nope", "file.bin", io.BytesIO(b"abc"), 3)
+    with raises(KeyError):
+        list(db.open_attachment(12345))
+
+
+def test_listing_words_never_reads_attachments(db_factory):
+    db: "DBPersistence" = db_factory()
+    db.new_word("word1", "content", {"thing"})
+    db.add_attachment("word1", "big.bin", io.BytesIO(bytes(100_000)), 100_000)
+    with captured_statements(db) as statements:
+        list(db.get_words_filtered())
+        list(db.get_words_filtered("thing"))
+        db.get_word("word1")
+        db.list_attachments("word1")
+    assert not any("attachment.data" in statement for statement, _ in statements)
+
+
+def test_attachments_go_away_with_the_word(db_factory):
+    db: "DBPersistence" = db_factory()
+    db.new_word("word1", "content", set())
+    attachment_id = db.add_attachment("word1", "a.bin", io.BytesIO(b"abc"), 3)
+    db.delete_word("word1")
+    with raises(KeyError):
+        list(db.open_attachment(attachment_id))
@@ -0,0 +1,51 @@
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from tests.test_history import make_text
+from wordspreader.dedupe import clusters, minhash, shingles, similarity
+
+
+def jaccard(first: str, second: str) -> float:
+    a, b = shingles(first), shingles(second)
+    return len(a & b) / len(a | b)
+
+
+@settings(max_examples=25, deadline=None)
+@given(seed=st.integers(0, 10_000), cut=st.integers(1, 20))
+def test_signatures_estimate_similarity(seed, cut):
+    text = make_text(seed, 60)
+    edited = text[: len(text) // 2] + make_text(seed + 1, cut) + text[len(text) // 2 :]
+    estimate = similarity(minhash(text), minhash(edited))
+    # 64 hashes keep the error of the estimate around 0.06
+    assert abs(estimate - jaccard(text, edited)) < 0.25
+
+
+def test_normalization():
+    assert minhash("Hello   World\n") == minhash("hello world")
+    assert similarity(minhash("short"), minhash("short")) == 1
+
+
+def test_clusters():
+    assert sorted(map(sorted, clusters([(1, 2), (3, 4), (2, 5)]))) == [[1, 2, 5], [3, 4]]
+
+
+def test_near_duplicates_are_found(db_factory):
+    db = db_factory()
+    original = make_text(1, 80)
+    db.new_word("original", original, set())
+    db.new_word("copy", original.replace(" ", "  ", 3) + " thanks!", set())
+    db.new_word("unrelated", make_text(2, 80), set())
+    db.new_word("also unrelated", make_text(3, 80), set())
+
+    found = db.find_near_duplicates(original)
+    assert [name for name, _ in found] == ["original", "copy"]
+    assert found[0][1] == 1
+    assert db.duplicate_clusters() == [["copy", "original"]]
+
+    # The index follows edits and deletes
+    db.update_word("copy", content=make_text(4, 80))
+    assert [name for name, _ in db.find_near_duplicates(original)] == ["original"]
+    db.update_word("unrelated", content=original)
+    db.delete_word("original")
+    assert [name for name, _ in db.find_near_duplicates(original)] == ["unrelated"]
+    assert db.duplicate_clusters() == []
@@ -0,0 +1,94 @@
+import sqlite3
+from pathlib import Path
+
+from pytest import fixture, raises
+
+from wordspreader.federation import LibraryWord
+from wordspreader.persistence import DBPersistence
+
+
+@fixture()
+def libraries(tmp_path: Path) -> tuple[DBPersistence, Path, Path]:
+    primary = DBPersistence.from_file(tmp_path / "primary.sqlite3")
+    primary.new_word("shared", "from primary", {"feed"})
+    primary.new_word("primary only", "just here", set())
+    team_a = DBPersistence.from_file(tmp_path / "team_a.sqlite3")
+    team_a.new_word("shared", "from team a", {"feed", "zarya"})
+    team_a.new_word("team a only", "only a", {"reload"})
+    team_b = DBPersistence.from_file(tmp_path / "team_b.sqlite3")
+    team_b.new_word("shared", "from team b", set())
+    team_b.new_word("team a only", "b has it too", {"sigma"})
+    for db in (team_a, team_b):
+        db.close()
+        db.engine.dispose()
+    yield primary, tmp_path / "team_a.sqlite3", tmp_path / "team_b.sqlite3"
+    primary.close()
+
+
+def test_words_across_libraries(libraries):
+    primary, team_a, team_b = libraries
+    primary.attach_library(team_a, "team_a")
+    primary.attach_library(team_b, "team_b")
+    assert primary.libraries == ["main", "team_a", "team_b"]
+    words = set(primary.get_library_words())
+    assert LibraryWord("team_a", "shared", "from team a", frozenset({"feed", "zarya"})) in words
+    assert LibraryWord("main", "primary only", "just here", frozenset()) in words
+    assert len(words) == 6
+    assert {(w.library, w.name) for w in primary.get_library_words("feed")} == {
+        ("main", "shared"),
+        ("team_a", "shared"),
+    }
+    assert set(primary.get_library_tags()) == {"feed", "zarya", "reload", "sigma"}
+
+
+def test_name_collisions(libraries):
+    primary, team_a, team_b = libraries
+    primary.attach_library(team_a, "team_a")
+    primary.attach_library(team_b, "team_b")
+    assert primary.get_name_collisions() == {
+        "shared": ["main", "team_a", "team_b"],
+        "team a only": ["team_a", "team_b"],
+    }
+
+
+def test_writes_only_go_to_the_primary(libraries):
+    primary, team_a, _ = libraries
+    primary.attach_library(team_a, "team_a")
+    primary.new_word("new one", "content", {"zarya"})
+    primary.update_word("shared", content="changed")
+    libraries_with_new = {w.library for w in primary.get_library_words() if w.name == "new one"}
+    assert libraries_with_new == {"main"}
+    assert primary.get_word("shared").content == "changed"
+    team_a_shared = [
+        w for w in primary.get_library_words() if w.library == "team_a" and w.name == "shared"
+    ]
+    assert team_a_shared[0].content == "from team a"
+
+
+def test_detach_and_bad_names(libraries):
+    primary, team_a, _ = libraries
+    with raises(ValueError):
+        primary.attach_library(team_a, "main")
+    with raises(ValueError):
+        primary.attach_library(team_a, "not valid")
+    primary.attach_library(team_a, "team_a")
+    primary.detach_library("team_a")
+    assert {w.library for w in primary.get_library_words()} == {"main"}
+
+
+def test_missing_and_foreign_files(libraries, tmp_path):
+    primary, team_a, _ = libraries
+    missing = tmp_path / "tema_a.sqlite3"
+    with raises(FileNotFoundError):
+        primary.attach_library(missing, "team_a")
+    assert not missing.exists()
+    other = tmp_path / "other.sqlite3"
+    with sqlite3.connect(other) as conn:
+        conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY)")
+    conn.close()
+    with raises(ValueError):
+        primary.attach_library(other, "other")
+    # Neither is kept, the rest still read fine
+    primary.attach_library(team_a, "team_a")
+    assert primary.libraries == ["main", "team_a"]
+    assert len(set(primary.get_library_words())) == 4
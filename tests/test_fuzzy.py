@@ -0,0 +1,72 @@
+import random
+import time
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from wordspreader.fuzzy import FuzzyIndex, subsequence_score
+
+TITLES = [
+    "Zarya Shield Powerup",
+    "Sigma absorb projectiles",
+    "Torbjorn auto-reload",
+    "Wrecking Ball auto-reload",
+    "Lifeweaver auto-reload",
+]
+
+
+def test_subsequence_score_prefers_runs_and_word_starts():
+    assert subsequence_score("zsp", "zarya shield powerup") is not None
+    assert subsequence_score("xyz", "zarya shield powerup") is None
+    assert subsequence_score("sh", "zarya shield") > subsequence_score("sd", "zarya shield")
+
+
+def test_search_ranks_the_closest_first():
+    index = FuzzyIndex(TITLES)
+    assert index.search("auto rel")[0] in {t for t in TITLES if "auto-reload" in t}
+    assert index.search("wreck")[0] == "Wrecking Ball auto-reload"
+    assert index.search("zarya sheild")[0] == "Zarya Shield Powerup", "Typos still match"
+    assert index.search("si") == ["Sigma absorb projectiles"], "Short queries match a prefix"
+    assert index.search("   ") == []
+
+
+def test_incremental_updates():
+    index = FuzzyIndex(TITLES)
+    index.add("Zarya bubble timing")
+    assert "Zarya bubble timing" in index.search("zarya bub")
+    index.rename("Zarya bubble timing", "Zarya bubble cooldown")
+    assert index.search("bubble cool")[0] == "Zarya bubble cooldown"
+    assert "Zarya bubble timing" not in index
+    index.remove("Zarya bubble cooldown")
+    assert "Zarya bubble cooldown" not in index.search("bubble cool")
+    # Freed ids get reused without mixing titles up
+    index.add("Sombra hack")
+    assert index.search("sombra")[0] == "Sombra hack"
+    assert len(index) == len(TITLES) + 1
+
+
+@given(titles=st.sets(st.text(min_size=3, max_size=30), min_size=1, max_size=30))
+def test_every_title_finds_itself(titles: set[str]):
+    index = FuzzyIndex(titles)
+    for title in titles:
+        if title.strip():
+            assert title in index.search(title, limit=len(titles))
+
+
+def test_keystrokes_are_fast_on_a_large_index():
+    rng = random.Random(0)
+    syllables = ["za", "ry", "shi", "eld", "re", "lo", "ad", "wre", "ck", "ing", "ba", "tor", "gma"]
+    titles = {
+        " ".join("".join(rng.choices(syllables, k=3)).title() for _ in range(3))
+        for _ in range(20_000)
+    }
+    index = FuzzyIndex(titles)
+    title = sorted(titles)[123]
+    timings = []
+    for end in range(1, len(title) + 1):
+        start = time.perf_counter()
+        index.search(title[:end])
+        timings.append(time.perf_counter() - start)
+    assert index.search(title)[0] == title
+    # Generous, so it holds on slow CI machines, see benchmarks/bench_fuzzy.py for real numbers
+    assert max(timings) < 0.05
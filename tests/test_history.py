@@ -0,0 +1,70 @@
+import random
+import time
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from wordspreader.history import (
+    KEYFRAME_INTERVAL,
+    apply_delta,
+    encode_delta,
+    encode_keyframe,
+    encode_revision,
+    rebuild,
+)
+
+
+def make_text(seed: int, words: int = 400) -> str:
+    rng = random.Random(seed)
+    vocabulary = ["zarya", "shield", "damage", "reload", "ball", "hammer", "spikes", "healing"]
+    return " ".join(f"{rng.choice(vocabulary)}{rng.randrange(1000)}" for _ in range(words))
+
+
+@given(previous=st.text(max_size=300), content=st.text(max_size=300))
+def test_delta_round_trip(previous: str, content: str):
+    assert apply_delta(previous, encode_delta(previous, content)) == content
+
+
+def test_small_edit_makes_a_small_delta():
+    previous = make_text(0)
+    content = previous[:1000] + "an edit in the middle" + previous[1000:]
+    delta = encode_delta(previous, content)
+    assert len(delta) < 64
+    assert len(delta) < len(encode_keyframe(content)) / 4
+
+
+def test_deltas_of_long_content_are_quick():
+    previous = make_text(0, 2500)
+    assert len(previous) > 20_000
+    edits = [
+        previous[:9000] + "edit" + previous[9000:],
+        make_text(1, 2500),
+        previous.replace("zarya", "ZARYA"),
+    ]
+    for content in edits:
+        started = time.perf_counter()
+        delta = encode_delta(previous, content)
+        # Held under the write lock, this used to take seconds
+        assert time.perf_counter() - started < 0.5
+        assert apply_delta(previous, delta) == content
+
+
+def test_keyframes_are_forced_on_the_interval():
+    previous = make_text(0)
+    keyframe, _ = encode_revision(KEYFRAME_INTERVAL, previous, previous + "!")
+    assert keyframe
+    keyframe, _ = encode_revision(KEYFRAME_INTERVAL + 1, previous, previous + "!")
+    assert not keyframe
+
+
+@given(contents=st.lists(st.text(max_size=100), min_size=1, max_size=40))
+def test_rebuild_any_revision(contents: list[str]):
+    revisions = []
+    previous = None
+    for number, content in enumerate(contents):
+        revisions.append(encode_revision(number, previous, content))
+        previous = content
+    for number, content in enumerate(contents):
+        start = max(i for i in range(number + 1) if revisions[i][0])
+        assert number - start < KEYFRAME_INTERVAL
+        assert rebuild(revisions[start : number + 1]) == content
@@ -0,0 +1,84 @@
+import hashlib
+import sqlite3
+
+from sqlalchemy import inspect, select
+
+from wordspreader.migrations import SCHEMA_VERSION, version_table
+from wordspreader.persistence import DBPersistence
+
+# The schema as it was before it was versioned
+UNVERSIONED_SCHEMA = """
+CREATE TABLE tag (id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, PRIMARY KEY (id), UNIQUE (name));
+CREATE TABLE words (
+    id INTEGER NOT NULL, name VARCHAR NOT NULL, content VARCHAR NOT NULL,
+    PRIMARY KEY (id), UNIQUE (name)
+);
+CREATE TABLE tagging (
+    tag_id INTEGER NOT NULL, entry_id INTEGER NOT NULL, PRIMARY KEY (tag_id, entry_id),
+    FOREIGN KEY(tag_id) REFERENCES tag (id) ON DELETE CASCADE,
+    FOREIGN KEY(entry_id) REFERENCES words (id) ON DELETE CASCADE
+);
+INSERT INTO tag (id, name) VALUES (1, 'zarya');
+INSERT INTO words (id, name, content) VALUES (1, 'Zarya Shield Powerup', 'Zarya gets stronger');
+INSERT INTO tagging (tag_id, entry_id) VALUES (1, 1);
+"""
+
+
+def schema_version(db: DBPersistence) -> int:
+    with db.engine.connect() as conn:
+        return conn.scalar(select(version_table.c.version))
+
+
+def test_unversioned_database_is_migrated(tmp_path):
+    db_file = tmp_path / "old.sqlite3"
+    with sqlite3.connect(db_file) as conn:
+        conn.executescript(UNVERSIONED_SCHEMA)
+    conn.close()
+
+    db = DBPersistence.from_file(db_file)
+    assert schema_version(db) == SCHEMA_VERSION
+    inspector = inspect(db.engine)
+    assert {"copy_count", "last_used"} <= {c["name"] for c in inspector.get_columns("words")}
+    assert "ix_tagging_entry_id" in {i["name"] for i in inspector.get_indexes("tagging")}
+    assert "revision" in inspector.get_table_names()
+    word = db.get_word("Zarya Shield Powerup")
+    assert word.tags == {"zarya"}
+    assert word.copy_count == 0
+    # Written before templates, so it copies as it always did
+    assert not word.templated
+    # Identified by name, so copies of this file migrated on different machines still match up
+    assert word.uid == hashlib.blake2b(word.name.encode("utf-8"), digest_size=16).hexdigest()
+    assert [c.name for c in db.changes_for("peer").changes] == [word.name]
+    assert db.find_near_duplicates("Zarya gets stronger") == [(word.name, 1.0)]
+    assert word.sort_key is not None
+    assert [w.name for w in db.get_words_page()] == [word.name]
+    # And the new features work on it
+    db.record_use(word.name)
+    db.update_word(word.name, content="Zarya gets even stronger")
+    assert db.get_revision(word.name, 0) == "Zarya gets stronger"
+    db.close()
+
+
+def test_restoring_an_old_backup_migrates_it(tmp_path):
+    backup = tmp_path / "old.sqlite3"
+    with sqlite3.connect(backup) as conn:
+        conn.executescript(UNVERSIONED_SCHEMA)
+    conn.close()
+
+    db = DBPersistence.from_file(tmp_path / "live.sqlite3")
+    db.new_word("word1", "content")
+    db.restore(backup)
+    assert schema_version(db) == SCHEMA_VERSION
+    assert [w.name for w in db.get_words_filtered()] == ["Zarya Shield Powerup"]
+    db.new_word("word2", "content")
+    assert [w.name for w in db.get_words_page()] == ["Zarya Shield Powerup", "word2"]
+    assert db.search_titles("word2", limit=1) == ["word2"]
+    db.close()
+
+
+def test_new_database_starts_at_the_latest_version(tmp_path):
+    db = DBPersistence.from_file(tmp_path / "new.sqlite3")
+    assert schema_version(db) == SCHEMA_VERSION
+    db.engine.dispose()
+    # Opening it again doesn't run anything
+    assert schema_version(DBPersistence.from_file(tmp_path / "new.sqlite3")) == SCHEMA_VERSION
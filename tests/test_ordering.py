@@ -0,0 +1,139 @@
+from hypothesis import given, settings
+from hypothesis import strategies as st
+from pytest import raises
+from sqlalchemy import select
+
+from tests.test_query_plans import captured_statements
+from wordspreader.ddl import Word
+from wordspreader.ordering import REBALANCE_LENGTH, key_between, spaced_keys
+
+
+def order(db) -> list[str]:
+    return [w.name for w in db.get_words_filtered(order_by="manual")]
+
+
+def sort_keys(db) -> dict[str, str]:
+    with db.engine.connect() as conn:
+        return dict(conn.execute(select(Word.name, Word.sort_key)).all())
+
+
+@settings(max_examples=50)
+@given(st.lists(st.integers(0, 1_000), max_size=200))
+def test_keys_fit_between_any_two(positions):
+    keys = []
+    for position in positions:
+        i = position % (len(keys) + 1)
+        before = keys[i - 1] if i else None
+        after = keys[i] if i < len(keys) else None
+        key = key_between(before, after)
+        assert (before is None or before < key) and (after is None or key < after)
+        keys.insert(i, key)
+    assert keys == sorted(keys)
+
+
+def test_keys():
+    assert key_between(None, None) == "a0"
+    assert key_between("a0", None) == "a1"
+    assert key_between(None, "a0") == "Zz"
+    assert key_between("a0", "a1") == "a0V"
+    assert key_between("az", None) == "b00"
+    with raises(ValueError):
+        key_between("a1", "a0")
+    with raises(ValueError):
+        key_between("a0V0", None)
+    for count in (0, 1, 62, 63, 5000):
+        keys = spaced_keys(count)
+        assert keys == sorted(set(keys))
+        assert len(keys) == count
+    assert max(map(len, spaced_keys(5000))) == 4
+
+
+def test_keys_at_the_ends_grow_slowly():
+    last = first = None
+    for _ in range(100_000):
+        last = key_between(last, None)
+        first = key_between(None, first)
+    assert (len(last), len(first)) == (4, 4)
+
+
+def test_moving_writes_one_row(db_factory):
+    db = db_factory()
+    for i in range(5):
+        db.new_word(f"word{i}", f"content {i}")
+    assert order(db) == ["word0", "word1", "word2", "word3", "word4"]
+    before = sort_keys(db)
+
+    with captured_statements(db) as statements:
+        db.move_word("word4", after="word0")
+    writes = [s for s, _ in statements if s.lstrip().upper().startswith("UPDATE")]
+    assert len(writes) == 1
+    assert order(db) == ["word0", "word4", "word1", "word2", "word3"]
+    after = sort_keys(db)
+    assert {name for name in before if before[name] != after[name]} == {"word4"}
+
+    db.move_word("word3")
+    db.move_word("word0", after="word2")
+    assert order(db) == ["word3", "word4", "word1", "word2", "word0"]
+    # Pinned and unpinned words are ordered apart
+    db.pin_word("word2")
+    with raises(ValueError):
+        db.move_word("word2", after="word1")
+
+
+def test_pinned_words_come_first(db_factory):
+    db = db_factory()
+    for i in range(4):
+        db.new_word(f"word{i}", f"content {i}")
+    db.pin_word("word2")
+    db.pin_word("word3")
+    db.move_word("word3")
+    assert order(db) == ["word3", "word2", "word0", "word1"]
+    db.new_word("new", "content")
+    assert order(db) == ["word3", "word2", "word0", "word1", "new"]
+    db.pin_word("word3", pinned=False)
+    assert order(db) == ["word2", "word3", "word0", "word1", "new"]
+
+
+def test_pages_follow_the_order(db_factory):
+    db = db_factory()
+    for i in range(7):
+        db.new_word(f"word{i}", f"content {i}")
+    db.pin_word("word5")
+    db.move_word("word0", after="word3")
+    expected = order(db)
+    pages, after = [], None
+    while page := db.get_words_page(after, limit=3):
+        pages.append([w.name for w in page])
+        after = page[-1].name
+    assert pages == [expected[0:3], expected[3:6], expected[6:]]
+
+
+def test_appending_never_rebalances(db_factory, monkeypatch):
+    db = db_factory()
+    rebalances = []
+    monkeypatch.setattr(db, "rebalance_order", lambda: rebalances.append(1))
+    for i in range(1000):
+        db.new_word(f"word{i}", f"content {i}")
+    db.move_word("word999")
+    db.pin_word("word500")
+    db.pin_word("word500", pinned=False)
+    assert max(map(len, sort_keys(db).values())) < REBALANCE_LENGTH
+    assert rebalances == []
+
+
+def test_long_keys_are_rebalanced(db_factory, monkeypatch):
+    db = db_factory()
+    rebalances = []
+    rebalance = db.rebalance_order
+    monkeypatch.setattr(db, "rebalance_order", lambda: rebalances.append(rebalance()))
+    for i in range(3):
+        db.new_word(f"word{i}", f"content {i}")
+    # Always into the same gap, each key a little longer than the last
+    for i in range(REBALANCE_LENGTH * 8):
+        db.new_word(f"squeezed{i}", "content")
+        db.move_word(f"squeezed{i}", after="word0")
+    assert rebalances
+    keys = sort_keys(db)
+    assert max(map(len, keys.values())) <= REBALANCE_LENGTH
+    squeezed = [f"squeezed{i}" for i in reversed(range(REBALANCE_LENGTH * 8))]
+    assert order(db) == ["word0", *squeezed, "word1", "word2"]
@@ -3,6 +3,7 @@ from typing import TYPE_CHECKING
 from hypothesis import given
 from hypothesis import strategies as st
 from pytest import mark, raises
+from sqlalchemy.exc import NoResultFound
 
 from wordspreader.ddl import Tag, Word
 
@@ -144,3 +145,223 @@ def test__orphans_are_cleaned_up_when_word_deleted(db_factory):
     assert len(list(db.get_all_tags())) == 2, "Tags should exist still"
     db.delete_word(word1.name)
     assert len(list(db.get_all_tags())) == 0, "Tags should be cleaned up now"
+
+
+def test__record_use_is_buffered_until_flush(db_factory):
+    db: "DBPersistence" = db_factory()
+    make_get_check("word1", "", set(), db)
+    db.record_use("word1")
+    db.record_use("word1")
+    assert db.get_word("word1").copy_count == 0, "Uses should only be in memory until flushed"
+    assert db.usage.pending == {"word1": 2}
+    assert db.usage.flush() == 1
+    word = db.get_word("word1")
+    assert word.copy_count == 2
+    assert word.last_used is not None
+    assert db.usage.pending == {}
+
+
+def test__get_words_ordered_by_usage(db_factory):
+    db: "DBPersistence" = db_factory()
+    for name in ("word1", "word2", "word3"):
+        make_get_check(name, "", set(), db)
+    for name in ("word2", "word2", "word3", "word2", "word3", "word1"):
+        db.record_use(name)
+    most_used = [w.name for w in db.get_words_filtered(order_by="most_used")]
+    assert most_used == ["word2", "word3", "word1"]
+    db.record_use("word3")
+    recently_used = [w.name for w in db.get_words_filtered(order_by="recently_used")]
+    assert recently_used[0] == "word3"
+
+
+def test__record_use_survives_rename(db_factory):
+    db: "DBPersistence" = db_factory()
+    make_get_check("word1", "", set(), db)
+    db.record_use("word1")
+    db.update_word("word1", new_name="word2")
+    assert db.get_word("word2").copy_count == 1
+
+
+def test__backup_and_restore(tmp_path):
+    from wordspreader.persistence import DBPersistence
+
+    db = DBPersistence.from_file(tmp_path / "live.sqlite3")
+    make_get_check("word1", "content", {"thing"}, db)
+    result = db.backup(tmp_path / "backup.sqlite3", pages_per_step=1).result()
+    assert result.destination.exists()
+    assert result.pages > 1
+    make_get_check("word2", "content", {"stuff"}, db)
+    db.delete_word("word1")
+    db.restore(tmp_path / "backup.sqlite3")
+    assert {w.name for w in db.get_words_filtered()} == {"word1"}
+    assert set(db.get_all_tags()) == {"thing"}
+    db.close()
+
+
+def test__backup_in_memory(db_factory, tmp_path):
+    from wordspreader.persistence import DBPersistence
+
+    db: "DBPersistence" = db_factory()
+    make_get_check("word1", "content", set(), db)
+    db.backup(tmp_path / "backup.sqlite3").result()
+    restored = DBPersistence.from_file(tmp_path / "backup.sqlite3")
+    check_word("word1", "content", set(), restored.get_word("word1"))
+
+
+def test__scheduled_backups_rotate(tmp_path):
+    from wordspreader.backup import BackupScheduler
+    from wordspreader.persistence import DBPersistence
+
+    db = DBPersistence.from_file(tmp_path / "live.sqlite3")
+    scheduler = BackupScheduler(db, tmp_path / "backups", interval=3600, keep=2)
+    for _ in range(4):
+        scheduler.snapshot().result()
+    # Waits on the backup thread, which prunes once each snapshot is done
+    db.close()
+    assert len(scheduler.snapshots()) == 2
+
+
+def test__revisions_are_recorded_and_restored(db_factory):
+    from tests.test_history import make_text
+
+    db: "DBPersistence" = db_factory()
+    # Each revision appends a little to the last one
+    text = make_text(0, words=200)
+    contents = [text[: 600 + i * 10] for i in range(40)]
+    make_get_check("word1", contents[0], set(), db)
+    for content in contents[1:]:
+        db.update_word("word1", content=content)
+    # Tag only changes and renames don't make new revisions
+    db.update_word("word1", tags={"thing"}, new_name="word2")
+    revisions = db.list_revisions("word2")
+    assert [r.number for r in revisions] == list(range(len(contents)))
+    assert sum(r.keyframe for r in revisions) < len(contents) / 4
+    for number, content in enumerate(contents):
+        assert db.get_revision("word2", number) == content
+    db.restore_revision("word2", 3)
+    assert db.get_word("word2").content == contents[3]
+    assert len(db.list_revisions("word2")) == len(contents) + 1
+
+
+def test__revisions_go_away_with_the_word(db_factory):
+    from wordspreader.ddl import Revision
+
+    db: "DBPersistence" = db_factory()
+    make_get_check("word1", "one", set(), db)
+    db.update_word("word1", content="two")
+    db.delete_word("word1")
+    with db._get_session() as session:
+        assert session.query(Revision).count() == 0
+
+
+def test__large_content_is_compressed_once_turned_on(db_factory, monkeypatch):
+    from sqlalchemy import text
+
+    from tests.test_history import make_text
+    from wordspreader import ddl
+
+    # Put back as it was afterwards, the setting goes with the cleared database
+    monkeypatch.setattr(ddl, "COMPRESS_THRESHOLD", ddl.COMPRESS_THRESHOLD)
+    db: "DBPersistence" = db_factory()
+    big, small = make_text(0), "short"
+    make_get_check("big", big, {"thing"}, db)
+    make_get_check("small", small, {"thing"}, db)
+
+    def storage() -> dict[str, tuple[str, int]]:
+        with db.engine.connect() as conn:
+            rows = conn.execute(text("SELECT name, typeof(content), length(content) FROM words"))
+            return {name: (kind, size) for name, kind, size in rows}
+
+    # Off until it is asked for
+    assert db.compress_threshold == 0
+    assert storage()["big"] == ("text", len(big))
+
+    # Turning it on rewrites what is already there too
+    assert db.set_compression() == 1
+    assert db.compress_threshold == ddl.DEFAULT_COMPRESS_THRESHOLD
+    assert storage()["big"][0] == "blob"
+    assert storage()["big"][1] < len(big) / 2
+    assert storage()["small"] == ("text", len(small))
+    make_get_check("bigger", big + big, set(), db)
+    assert storage()["bigger"][0] == "blob"
+    assert {w.content for w in db.get_words_filtered("thing")} == {big, small}
+
+    # And back off again
+    assert db.set_compression(0, vacuum=True) == 2
+    assert storage()["big"] == ("text", len(big))
+    check_word("big", big, {"thing"}, db.get_word("big"))
+
+
+def test__compression_is_kept_with_the_library(tmp_path, monkeypatch):
+    from wordspreader import ddl
+    from wordspreader.persistence import DBPersistence
+
+    monkeypatch.setattr(ddl, "COMPRESS_THRESHOLD", ddl.COMPRESS_THRESHOLD)
+    db = DBPersistence.from_file(tmp_path / "compressed.sqlite3")
+    db.set_compression(512)
+    db.close()
+    DBPersistence.from_file(tmp_path / "plain.sqlite3").close()
+    assert ddl.COMPRESS_THRESHOLD == 0
+    reopened = DBPersistence.from_file(tmp_path / "compressed.sqlite3")
+    assert reopened.compress_threshold == ddl.COMPRESS_THRESHOLD == 512
+    reopened.close()
+
+
+def test__templates_are_opt_in(db_factory):
+    db: "DBPersistence" = db_factory()
+    make_get_check("snippet", 'print(f"{name}")', set(), db)
+    assert not db.get_word("snippet").templated
+    db.set_templated("snippet")
+    assert db.get_word("snippet").templated
+    db.set_templated("snippet", templated=False)
+    assert not db.get_word("snippet").templated
+    with raises(NoResultFound):
+        db.set_templated("missing")
+
+
+def test__title_index_follows_changes(db_factory):
+    db: "DBPersistence" = db_factory()
+    make_get_check("Meeting follow up", "one", set(), db)
+    make_get_check("Out of office", "two", set(), db)
+    assert db.search_titles("meetng")[0] == "Meeting follow up"
+
+    # Changes made after the index is built show up without rebuilding it
+    make_get_check("Meeting notes", "three", set(), db)
+    db.update_word("Out of office", new_name="Away from office")
+    db.delete_word("Meeting follow up")
+    assert db.search_titles("meeting") == ["Meeting notes"]
+    assert db.search_titles("ofice") == ["Away from office"]
+    assert len(db.title_index) == 2
+
+
+def test__bulk_operations_are_set_based(db_factory):
+    from tests.test_query_plans import captured_statements
+
+    db: "DBPersistence" = db_factory()
+    for i in range(30):
+        make_get_check(f"word{i}", f"content {i}", {"common", f"only{i}"}, db)
+    selected = [f"word{i}" for i in range(25)]
+
+    with captured_statements(db) as statements:
+        db.tag_words(selected, add={"picked", "common"}, remove={"only0", "only1"})
+    # Making the tags, tagging, untagging and the orphan cleanup, whatever the number of words
+    assert len([s for s, _ in statements if not s.startswith("BEGIN")]) == 4
+    assert set(db.get_all_tags()) == {"common", "picked"} | {f"only{i}" for i in range(2, 30)}
+    check_word("word0", "content 0", {"common", "picked"}, db.get_word("word0"))
+    check_word("word29", "content 29", {"common", "only29"}, db.get_word("word29"))
+
+    exported = db.export_words(["word2", "word29", "missing"])
+    assert exported == [
+        {"title": "word2", "words": "content 2", "tags": ["common", "only2", "picked"]},
+        {"title": "word29", "words": "content 29", "tags": ["common", "only29"]},
+    ]
+
+    with captured_statements(db) as statements:
+        assert db.delete_words([*selected, "missing"]) == 25
+    assert len([s for s, _ in statements if not s.startswith("BEGIN")]) == 3
+    assert [w.name for w in db.get_words_filtered()] == [f"word{i}" for i in range(25, 30)]
+    # Tags only the deleted words had are gone, along with what hung off the words
+    assert "picked" not in set(db.get_all_tags())
+    assert set(db.get_all_tags()) == {"common"} | {f"only{i}" for i in range(25, 30)}
+    assert "word1" not in db.search_titles("word1")
+    assert db.list_revisions("word0") == []
@@ -0,0 +1,115 @@
+import re
+from collections.abc import Callable
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from pytest import fixture, mark
+from sqlalchemy import event
+
+if TYPE_CHECKING:
+    from wordspreader.persistence import DBPersistence
+
+# A scan without an index, `SCAN tag USING COVERING INDEX ...` is fine
+FULL_SCAN = re.compile(r"^SCAN (\S+)$")
+# Tables of one row, there is nothing to index
+SINGLE_ROW = {"sync_replica"}
+
+
+@contextmanager
+def captured_statements(db: "DBPersistence"):
+    statements = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, executemany):
+        statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def full_scans(db: "DBPersistence", statements: list[tuple[str, tuple]]) -> dict[str, list[str]]:
+    """The tables each statement reads without an index"""
+    raw = db.engine.raw_connection()
+    try:
+        scans = {}
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+                continue
+            rows = raw.driver_connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            tables = [
+                m.group(1)
+                for *_, detail in rows
+                if (m := FULL_SCAN.match(detail)) and m.group(1) not in SINGLE_ROW
+            ]
+            if tables:
+                scans[" ".join(statement.split())] = tables
+        return scans
+    finally:
+        raw.close()
+
+
+@fixture()
+def db(db_factory) -> "DBPersistence":
+    db: "DBPersistence" = db_factory()
+    for i in range(20):
+        db.new_word(f"word{i}", f"content {i}", {f"tag{i % 4}", "common"})
+    db.record_use("word1")
+    return db
+
+
+OPERATIONS: dict[str, Callable[["DBPersistence"], object]] = {
+    "new_word": lambda db: db.new_word("new", "content", {"tag1", "brand new"}),
+    "get_word": lambda db: db.get_word("word1"),
+    "get_words_like": lambda db: list(db.get_words_like("word1%")),
+    "get_words_filtered by tag": lambda db: list(db.get_words_filtered("tag1")),
+    "get_words_filtered most used": lambda db: list(db.get_words_filtered(order_by="most_used")),
+    "get_words_filtered recently used": lambda db: list(
+        db.get_words_filtered(order_by="recently_used")
+    ),
+    "get_all_tags": lambda db: list(db.get_all_tags()),
+    "update_word content": lambda db: db.update_word("word1", content="changed"),
+    "update_word tags": lambda db: db.update_word("word1", tags={"tag2", "other"}),
+    "update_word rename": lambda db: db.update_word("word1", new_name="renamed"),
+    "delete_word": lambda db: db.delete_word("word1"),
+    "flush usage": lambda db: db.usage.flush(),
+    "list_revisions": lambda db: db.list_revisions("word1"),
+    "get_revision": lambda db: db.get_revision("word1", 0),
+    "list_attachments": lambda db: db.list_attachments("word1"),
+    "delete_words": lambda db: db.delete_words(["word1", "word2"]),
+    "tag_words": lambda db: db.tag_words(["word1", "word2"], {"tag3", "fresh"}, {"tag1"}),
+    "export_words": lambda db: db.export_words(["word1", "word2"]),
+    "changes_for": lambda db: db.changes_for("peer"),
+    "find_near_duplicates": lambda db: db.find_near_duplicates("content 1"),
+    "get_words_filtered manual": lambda db: list(db.get_words_filtered(order_by="manual")),
+    "get_words_page": lambda db: db.get_words_page("word5", limit=5),
+    "move_word": lambda db: db.move_word("word1", after="word7"),
+    "pin_word": lambda db: db.pin_word("word1"),
+    "unpin_word": lambda db: db.pin_word("word1", pinned=False),
+    "rebalance_order": lambda db: db.rebalance_order(),
+    "set_templated": lambda db: db.set_templated("word1"),
+}
+
+
+@mark.parametrize("operation", OPERATIONS)
+def test_queries_use_indexes(db, operation):
+    with captured_statements(db) as statements:
+        OPERATIONS[operation](db)
+    assert statements
+    assert full_scans(db, statements) == {}
+
+
+def test_only_the_full_listing_scans_words(db):
+    with captured_statements(db) as statements:
+        list(db.get_words_filtered())
+    scans = full_scans(db, statements)
+    assert list(scans.values()) == [["words"]]
+
+
+def test_the_duplicate_report_only_scans_shared_buckets(db):
+    with captured_statements(db) as statements:
+        db.duplicate_clusters()
+    # The buckets with more than one word, read from the covering index, everything else is a
+    # lookup by them
+    assert list(full_scans(db, statements).values()) == [["anon_1"]]
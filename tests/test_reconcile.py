@@ -0,0 +1,70 @@
+from collections.abc import Iterable
+
+from wordspreader.ddl import Word
+from wordspreader.reconcile import RowPool
+
+
+class Row:
+    """Stands in for the `Words` control, which needs a page"""
+
+    def __init__(self, word_id: int, title: str, words: str, tags: Iterable[str], **flags):
+        self.word_id = None
+        self.rebinds = 0
+        self.rebind(word_id, title, words, tags, **flags)
+
+    def rebind(self, word_id: int, title: str, words: str, tags: Iterable[str], **flags):
+        shown = (word_id, title, words, frozenset(tags), flags)
+        changed = shown != getattr(self, "shown", None)
+        if changed:
+            self.rebinds += 1
+        self.word_id, self.shown = word_id, shown
+        return changed
+
+
+def make_words(ids: Iterable[int]) -> list[Word]:
+    words = []
+    for word_id in ids:
+        word = Word(name=f"word{word_id}", content=f"content {word_id}", tags={})
+        word.id = word_id
+        words.append(word)
+    return words
+
+
+def test_adding_a_word_only_adds_its_row():
+    pool = RowPool(Row)
+    rows = pool.reconcile([], make_words(range(100))).rows
+    before = [row.rebinds for row in rows]
+
+    reconciled = pool.reconcile(rows, make_words([*range(50), 1000, *range(50, 100)]))
+    assert reconciled.changed == []
+    assert [row.word_id for row in reconciled.added] == [1000]
+    assert reconciled.rows[:50] == rows[:50]
+    assert reconciled.rows[51:] == rows[50:]
+    assert [row.rebinds for row in rows] == before
+
+
+def test_rows_are_recycled():
+    pool = RowPool(Row, size=3)
+    rows = pool.reconcile([], make_words(range(5))).rows
+    reconciled = pool.reconcile(rows, make_words([0]))
+    assert reconciled.rows == rows[:1]
+    # Only as many as fit
+    assert len(pool) == 3
+
+    recycled = pool.reconcile(reconciled.rows, make_words([0, 7, 8])).added
+    assert all(any(row is old for old in rows) for row in recycled)
+    assert [row.word_id for row in recycled] == [7, 8]
+    assert len(pool) == 1
+
+
+def test_changed_words_are_rebound_in_place():
+    pool = RowPool(Row)
+    rows = pool.reconcile([], make_words(range(3))).rows
+    words = make_words(range(3))
+    words[1].content = "edited"
+    words[2].templated = True
+    reconciled = pool.reconcile(rows, reversed(words))
+    assert reconciled.changed == [rows[2], rows[1]]
+    assert reconciled.rows == rows[::-1]
+    assert rows[1].shown[2] == "edited"
+    assert rows[2].shown[4] == {"pinned": False, "templated": True}
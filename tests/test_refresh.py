@@ -0,0 +1,67 @@
+import threading
+import time
+
+from wordspreader.refresh import RefreshScheduler
+
+
+def make_scheduler(**kwargs) -> tuple[RefreshScheduler, list[int], list[str]]:
+    loads = []
+    applied = []
+
+    def load() -> int:
+        loads.append(threading.current_thread().name)
+        return len(loads)
+
+    scheduler = RefreshScheduler(load, applied.append, **kwargs)
+    return scheduler, applied, loads
+
+
+def test_rapid_requests_are_coalesced():
+    scheduler, applied, loads = make_scheduler(delay=0.05)
+    for _ in range(20):
+        scheduler.request()
+    assert scheduler.wait(timeout=5)
+    assert applied == [1]
+    assert loads == ["wordspreader-refresh"], "Loading should happen on the worker thread"
+    scheduler.close()
+
+
+def test_requests_after_a_refresh_refresh_again():
+    scheduler, applied, _ = make_scheduler(delay=0.01)
+    scheduler.request()
+    assert scheduler.wait(timeout=5)
+    scheduler.request()
+    assert scheduler.wait(timeout=5)
+    assert applied == [1, 2]
+    scheduler.close()
+
+
+def test_steady_requests_still_refresh_by_max_delay():
+    scheduler, applied, _ = make_scheduler(delay=0.05, max_delay=0.1)
+    start = time.monotonic()
+    while not applied and time.monotonic() - start < 5:
+        scheduler.request()
+        time.sleep(0.01)
+    assert applied
+    assert time.monotonic() - start < 1
+    scheduler.close()
+
+
+def test_failed_refresh_keeps_the_worker_alive():
+    calls = []
+
+    def load():
+        calls.append(None)
+        if len(calls) == 1:
+            msg = "boom"
+            raise RuntimeError(msg)
+        return len(calls)
+
+    applied = []
+    scheduler = RefreshScheduler(load, applied.append, delay=0.01)
+    scheduler.request()
+    assert scheduler.wait(timeout=5)
+    scheduler.request()
+    assert scheduler.wait(timeout=5)
+    assert applied == [2]
+    scheduler.close()
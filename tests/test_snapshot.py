@@ -0,0 +1,41 @@
+from typing import TYPE_CHECKING
+
+from wordspreader.snapshot import (
+    FIRST_PAGE,
+    SnapshotRow,
+    dump_snapshot,
+    load_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+
+if TYPE_CHECKING:
+    from wordspreader.persistence import DBPersistence
+
+
+def test_round_trip_keeps_the_first_page(db_factory, tmp_path):
+    db: "DBPersistence" = db_factory()
+    for i in range(FIRST_PAGE + 10):
+        db.new_word(f"word{i}", f"content {i}", {f"tag{i % 3}"})
+    db.pin_word("word5")
+    db.set_templated("word5")
+    path = tmp_path / "wordspreader.snapshot"
+    words = db.get_words_filtered(order_by="manual")
+    write_snapshot(path, dump_snapshot(db.get_all_tags(), words))
+    snapshot = read_snapshot(path)
+    assert snapshot.tags == ["tag0", "tag1", "tag2"]
+    assert len(snapshot.rows) == FIRST_PAGE
+    pinned = db.get_word("word5")
+    assert snapshot.rows[0] == SnapshotRow(
+        pinned.id, "word5", "content 5", frozenset({"tag2"}), pinned=True, templated=True
+    )
+    assert not snapshot.rows[1].pinned
+    assert not snapshot.rows[1].templated
+
+
+def test_missing_or_bad_snapshots_are_ignored(tmp_path):
+    import marshal
+
+    assert read_snapshot(tmp_path / "nothing.snapshot") is None
+    assert load_snapshot(b"not a snapshot") is None
+    assert load_snapshot(marshal.dumps((0, [], []))) is None, "Other versions are ignored"
@@ -0,0 +1,136 @@
+from pathlib import Path
+
+from pytest import fixture, raises
+
+from wordspreader import ddl
+from wordspreader.persistence import DBPersistence
+from wordspreader.sync import Changeset, dump_changeset, load_changeset
+
+
+def library(tmp_path: Path, name: str) -> DBPersistence:
+    return DBPersistence.from_file(tmp_path / f"{name}.sqlite3")
+
+
+def contents(db: DBPersistence) -> dict[str, tuple[str, set[str]]]:
+    return {w.name: (w.content, set(w.tags)) for w in db.get_words_filtered()}
+
+
+@fixture()
+def pair(tmp_path) -> tuple[DBPersistence, DBPersistence]:
+    home, work = library(tmp_path, "home"), library(tmp_path, "work")
+    yield home, work
+    home.close()
+    work.close()
+
+
+def test_changes_flow_both_ways(pair):
+    home, work = pair
+    for i in range(20):
+        home.new_word(f"word{i}", f"content {i}", {"common", f"tag{i % 3}"})
+    result = home.sync_with(work)
+    assert (result.sent, result.received, result.conflicts) == (20, 0, [])
+    assert contents(work) == contents(home)
+    assert work.get_revision("word3", 0) == "content 3"
+
+    work.update_word("word1", content="edited at work", tags={"work"})
+    work.update_word("word2", new_name="renamed at work")
+    home.delete_word("word3")
+    home.tag_words(["word4", "word5"], add={"bulk"})
+    result = work.sync_with(home)
+    # Only what changed travels
+    assert (result.sent, result.received) == (2, 3)
+    assert contents(work) == contents(home)
+    assert contents(home)["word1"] == ("edited at work", {"work"})
+    assert "renamed at work" in contents(home)
+    assert "word3" not in contents(work)
+    # The tags nothing uses anymore went with them
+    assert set(home.get_all_tags()) == set(work.get_all_tags())
+
+    # Nothing left to exchange
+    result = home.sync_with(work)
+    assert (result.sent, result.received) == (0, 0)
+
+
+def test_usage_is_not_synced(pair):
+    home, work = pair
+    home.new_word("word", "content")
+    home.sync_with(work)
+    home.record_use("word")
+    home.usage.flush()
+    assert home.changes_for(work.replica_id).changes == []
+
+
+def test_conflicts_settle_the_same_way_everywhere(pair, tmp_path):
+    home, work = pair
+    laptop = library(tmp_path, "laptop")
+    home.new_word("word", "original", {"tag"})
+    home.new_word("gone", "soon")
+    home.sync_with(work)
+    work.sync_with(laptop)
+
+    home.update_word("word", content="home's edit")
+    work.update_word("word", content="work's edit")
+    laptop.delete_word("gone")
+    work.update_word("gone", content="edited while deleted")
+    result = home.sync_with(work)
+    assert result.conflicts == ["word"]
+    # Syncing in a different order ends up in the same place
+    laptop.sync_with(work)
+    home.sync_with(laptop)
+    work.sync_with(home)
+    assert contents(home) == contents(work) == contents(laptop)
+    # The losing edit is still in the history
+    kept = contents(home)["word"][0]
+    lost = ({"home's edit", "work's edit"} - {kept}).pop()
+    assert lost in {
+        db.get_revision("word", revision.number)
+        for db in (home, work)
+        for revision in db.list_revisions("word")
+    }
+    laptop.close()
+
+
+def test_names_taken_on_both_sides(pair):
+    home, work = pair
+    home.new_word("Greeting", "hello from home")
+    work.new_word("Greeting", "hello from work")
+    home.sync_with(work)
+    assert contents(home) == contents(work)
+    assert len(contents(home)) == 2
+    assert {content for content, _ in contents(home).values()} == {
+        "hello from home",
+        "hello from work",
+    }
+
+
+def test_changesets_travel_as_bytes(pair):
+    home, work = pair
+    home.new_word("word", "content", {"a", "b"})
+    home.delete_word(home.new_word("deleted", "content").name)
+    changeset = home.changes_for(work.replica_id)
+    assert load_changeset(dump_changeset(changeset)) == changeset
+    work.apply_changes(load_changeset(dump_changeset(changeset)))
+    assert contents(work) == contents(home)
+    with raises(ValueError):
+        load_changeset(b"[]")
+
+
+def test_copies_of_one_replica_refuse_to_sync(pair):
+    home, _ = pair
+    with raises(ValueError):
+        home.apply_changes(Changeset(home.replica_id, 0))
+
+
+def test_recompressing_is_not_a_change(pair, monkeypatch):
+    home, work = pair
+    for i in range(5):
+        home.new_word(f"word{i}", f"content {i} " * 200)
+    home.sync_with(work)
+    monkeypatch.setattr(ddl, "COMPRESS_THRESHOLD", ddl.COMPRESS_THRESHOLD)
+    for db in pair:
+        assert db.set_compression() == 5
+    # Nothing to send either way, only how the content is stored changed
+    assert home.changes_for(work.replica_id).changes == []
+    assert work.changes_for(home.replica_id).changes == []
+    home.new_word("after", "content")
+    assert home.sync_with(work).sent == 1
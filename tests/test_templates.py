@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from wordspreader.templates import TemplateCache, builtin_values, compile_template
+
+NOW = datetime(2023, 4, 1, 13, 30).astimezone()
+
+
+def test_fields_and_prompts():
+    template = compile_template("Hi {name}, {title} on {date}. Bye {name}!")
+    assert template.prompts == ("name",)
+    values = builtin_values("Zarya", NOW) | {"name": "Sam"}
+    assert template.render(values) == f"Hi Sam, Zarya on {NOW:%x}. Bye Sam!"
+
+
+def test_escapes_and_stray_braces_are_kept():
+    template = compile_template("{{literal}} and { } and {unclosed and }")
+    # It has to be rendered for the escapes to be undone
+    assert not template.is_plain
+    assert template.render({}) == "{literal} and { } and {unclosed and }"
+    assert compile_template("{ } and {unclosed and }").is_plain
+
+
+def test_escapes_do_not_depend_on_the_rest():
+    values = builtin_values("Zarya", NOW)
+    assert compile_template("a {{x}} b").render(values) == "a {x} b"
+    assert compile_template("a {{x}} b {date}").render(values) == f"a {{x}} b {NOW:%x}"
+
+
+@given(content=st.text(alphabet=st.characters(blacklist_characters="{}"), max_size=300))
+def test_content_without_braces_is_plain(content: str):
+    template = compile_template(content)
+    assert template.is_plain
+    assert template.render({}) == content
+
+
+def test_cache_reuses_until_content_changes():
+    cache = TemplateCache(maxsize=2)
+    first = cache.get(1, "Hello {name}")
+    assert cache.get(1, "Hello {name}") is first
+    changed = cache.get(1, "Goodbye {name}")
+    assert changed is not first
+    assert len(cache) == 1, "Only the current version of a word is kept"
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TemplateCache(maxsize=2)
+    one = cache.get(1, "one")
+    cache.get(2, "two")
+    assert cache.get(1, "one") is one
+    cache.get(3, "three")
+    assert len(cache) == 2
+    assert cache.get(1, "one") is one, "1 was used more recently than 2"
+    cache.discard(1)
+    assert len(cache) == 1
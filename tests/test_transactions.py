@@ -0,0 +1,166 @@
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import raises
+from sqlalchemy import event, update
+from sqlalchemy.exc import OperationalError
+
+from wordspreader import transactions
+from wordspreader.ddl import DuplicateKeyException, Word
+from wordspreader.persistence import DBPersistence
+from wordspreader.transactions import WRITE_ATTEMPTS, retry_when_locked
+
+WRITERS = 8
+WRITES_EACH = 15
+
+
+def locked_error() -> OperationalError:
+    orig = sqlite3.OperationalError("database is locked")
+    orig.sqlite_errorcode = sqlite3.SQLITE_BUSY
+    return OperationalError("UPDATE words ...", {}, orig)
+
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    db_file = tmp_path / "shared.sqlite3"
+    # Two libraries on one file stand in for two processes, each with threads of its own
+    libraries = [DBPersistence.from_file(db_file), DBPersistence.from_file(db_file)]
+    start = threading.Barrier(WRITERS)
+
+    def write(writer: int):
+        db = libraries[writer % 2]
+        start.wait()
+        for i in range(WRITES_EACH):
+            name = f"writer{writer} word{i}"
+            db.new_word(name, "first", {"shared", f"writer{writer}"})
+            db.update_word(name, content="second", tags={"shared", "updated"})
+            db.record_use(name)
+        db.usage.flush()
+
+    with ThreadPoolExecutor(WRITERS) as pool:
+        list(pool.map(write, range(WRITERS)))
+
+    db = libraries[0]
+    words = {w.name: w for w in db.get_words_filtered()}
+    assert len(words) == WRITERS * WRITES_EACH
+    for word in words.values():
+        assert (word.content, word.tags, word.copy_count) == ("second", {"shared", "updated"}, 1)
+        assert [r.number for r in db.list_revisions(word.name)] == [0, 1]
+    # The per writer tags lost their last word
+    assert set(db.get_all_tags()) == {"shared", "updated"}
+    for library in libraries:
+        library.close()
+
+
+def test_only_one_rename_to_a_name_wins(tmp_path):
+    db = DBPersistence.from_file(tmp_path / "rename.sqlite3")
+    for writer in range(WRITERS):
+        db.new_word(f"word{writer}", f"content {writer}")
+    start = threading.Barrier(WRITERS)
+
+    def rename(writer: int) -> bool:
+        start.wait()
+        try:
+            db.update_word(f"word{writer}", new_name="winner")
+        except DuplicateKeyException:
+            return False
+        return True
+
+    with ThreadPoolExecutor(WRITERS) as pool:
+        assert sum(pool.map(rename, range(WRITERS))) == 1
+    assert len(list(db.get_words_filtered())) == WRITERS
+    db.close()
+
+
+def test_locked_writes_are_retried(monkeypatch):
+    monkeypatch.setattr(transactions, "RETRY_DELAY", 0)
+    calls = []
+
+    @retry_when_locked
+    def flaky(failures: int) -> str:
+        calls.append(1)
+        if len(calls) <= failures:
+            raise locked_error()
+        return "written"
+
+    assert flaky(WRITE_ATTEMPTS - 1) == "written"
+    assert len(calls) == WRITE_ATTEMPTS
+
+    calls.clear()
+    with raises(OperationalError):
+        flaky(WRITE_ATTEMPTS)
+    assert len(calls) == WRITE_ATTEMPTS
+
+    @retry_when_locked
+    def broken():
+        calls.append(1)
+        statement, msg = "SELECT nope", "no such column"
+        raise OperationalError(statement, {}, sqlite3.OperationalError(msg))
+
+    calls.clear()
+    with raises(OperationalError):
+        broken()
+    assert len(calls) == 1, "Only a locked database is worth another try"
+
+
+def test_writes_leave_mounted_libraries_unlocked(tmp_path):
+    team = DBPersistence.from_file(tmp_path / "team.sqlite3")
+    team.new_word("theirs", "content")
+    team.close()
+    team.engine.dispose()
+    db = DBPersistence.from_file(tmp_path / "primary.sqlite3")
+    db.attach_library(tmp_path / "team.sqlite3", "team")
+    db.new_word("ours", "content")
+
+    with db.writer.begin() as conn:
+        conn.execute(update(Word).values(content="being written"))
+        # The team's own app, which can't wait on us at all
+        other = sqlite3.connect(tmp_path / "team.sqlite3", timeout=0)
+        with other:
+            other.execute("UPDATE words SET content = 'written by the team'")
+        other.close()
+        assert {w.library for w in db.get_library_words()} == {"main", "team"}
+    db.close()
+
+
+def test_new_words_take_the_lock_once(tmp_path):
+    from tests.test_query_plans import captured_statements
+
+    db = DBPersistence.from_file(tmp_path / "primary.sqlite3")
+    statements = []
+
+    def capture(_conn, _cursor, statement, *_):
+        statements.append(statement)
+
+    event.listen(db.writer.engine, "before_cursor_execute", capture)
+    word = db.new_word("word", "content", {"tag"})
+    event.remove(db.writer.engine, "before_cursor_execute", capture)
+    assert statements.count("BEGIN IMMEDIATE") == 1
+    # Everything the database filled in is there without going back to it
+    with captured_statements(db) as reads:
+        assert (word.tags, word.copy_count, word.pinned) == ({"tag"}, 0, False)
+        assert word.uid is not None and word.clock is not None
+    assert reads == []
+    db.close()
+
+
+def test_retried_bulk_writes_keep_their_words(db_factory, monkeypatch):
+    monkeypatch.setattr(transactions, "RETRY_DELAY", 0)
+    db = db_factory()
+    for i in range(4):
+        db.new_word(f"word{i}", f"content {i}")
+    begin = db.writer.begin
+    failures = []
+
+    def locked_once():
+        if len(failures) < 1:
+            failures.append(1)
+            raise locked_error()
+        return begin()
+
+    monkeypatch.setattr(db.writer, "begin", locked_once)
+    db.tag_words((f"word{i}" for i in range(2)), add={"tagged"})
+    assert {w.name for w in db.get_words_filtered("tagged")} == {"word0", "word1"}
+    failures.clear()
+    assert db.delete_words(f"word{i}" for i in range(3)) == 3
+    assert [w.name for w in db.get_words_filtered()] == ["word3"]
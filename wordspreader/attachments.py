@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import mimetypes
+import sqlite3
+from collections.abc import Iterator
+from typing import BinaryIO
+
+from sqlalchemy import func, insert
+from sqlalchemy.engine import Connection
+
+from wordspreader.ddl import Attachment
+
+# Large enough to keep the number of calls down, small enough to never matter for memory
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MEDIA_TYPE = "application/octet-stream"
+
+
+def guess_media_type(filename: str) -> str:
+    media_type, _ = mimetypes.guess_type(filename)
+    return media_type or DEFAULT_MEDIA_TYPE
+
+
+def write_attachment(
+    conn: Connection,
+    word_id: int,
+    filename: str,
+    stream: BinaryIO,
+    size: int,
+    media_type: str | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """
+    Stores `size` bytes from `stream` as a new attachment, returning its id.
+
+    The row is made with a zeroblob of the right size, which is then filled in place through
+    incremental blob I/O, so only one chunk is ever in memory.
+    """
+    result = conn.execute(
+        insert(Attachment).values(
+            word_id=word_id,
+            filename=filename,
+            media_type=media_type or guess_media_type(filename),
+            size=size,
+            data=func.zeroblob(size),
+        )
+    )
+    (attachment_id,) = result.inserted_primary_key
+    if not size:
+        return attachment_id
+    written = 0
+    with conn.connection.driver_connection.blobopen("attachment", "data", attachment_id) as blob:
+        while written < size and (chunk := stream.read(min(chunk_size, size - written))):
+            blob.write(chunk)
+            written += len(chunk)
+    if written != size:
+        msg = f"Expected {size} bytes for `{filename}`, the stream ended after {written}"
+        raise ValueError(msg)
+    return attachment_id
+
+
+def read_attachment(
+    conn: Connection, attachment_id: int, chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Yields the attachment's data a chunk at a time"""
+    try:
+        blob = conn.connection.driver_connection.blobopen(
+            "attachment", "data", attachment_id, readonly=True
+        )
+    except sqlite3.OperationalError as e:
+        msg = f"No attachment with id `{attachment_id}`"
+        raise KeyError(msg) from e
+    with blob:
+        while chunk := blob.read(chunk_size):
+            yield chunk
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from wordspreader.persistence import DBPersistence
+
+log = logging.getLogger(__name__)
+
+# Copying a few hundred pages at a time keeps the write lock windows short for the UI
+PAGES_PER_STEP = 256
+SNAPSHOT_PREFIX = "wordspreader-"
+SNAPSHOT_SUFFIX = ".sqlite3"
+
+
+@dataclass(frozen=True)
+class BackupResult:
+    destination: Path
+    pages: int
+    page_size: int
+    seconds: float
+
+    @property
+    def size(self) -> int:
+        return self.pages * self.page_size
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second"""
+        return self.size / self.seconds if self.seconds else float(self.size)
+
+
+def copy_database(
+    source: sqlite3.Connection,
+    target: sqlite3.Connection,
+    pages_per_step: int = PAGES_PER_STEP,
+    pause: float = 0.0,
+) -> tuple[int, float]:
+    """
+    Copies `source` into `target` with the SQLite online backup API, `pages_per_step` at a time.
+
+    Between steps the source is unlocked, so other connections can keep reading and writing,
+    and the copy restarts by itself if the source changes under it.
+    Returns the number of pages copied and how long it took.
+    """
+    total_pages = 0
+
+    def progress(_status: int, remaining: int, total: int):
+        nonlocal total_pages
+        total_pages = total
+        log.debug("Backup progress: %d of %d pages left", remaining, total)
+        if pause:
+            time.sleep(pause)
+
+    start = time.perf_counter()
+    source.backup(target, pages=pages_per_step, progress=progress)
+    return total_pages, time.perf_counter() - start
+
+
+def run_backup(
+    source: sqlite3.Connection, dest: Path, pages_per_step: int = PAGES_PER_STEP
+) -> BackupResult:
+    """Backs `source` up into a new file at `dest`, written next to it first so it appears whole"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    partial = dest.with_name(dest.name + ".partial")
+    partial.unlink(missing_ok=True)
+    target = sqlite3.connect(partial)
+    try:
+        pages, seconds = copy_database(source, target, pages_per_step)
+        page_size = target.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        target.close()
+    partial.replace(dest)
+    result = BackupResult(destination=dest, pages=pages, page_size=page_size, seconds=seconds)
+    log.info(
+        "Backed up %d bytes to `%s` in %.3fs (%.1f KiB/s)",
+        result.size,
+        dest,
+        result.seconds,
+        result.throughput / 1024,
+    )
+    return result
+
+
+class BackupScheduler:
+    """Snapshots the database every `interval` seconds, keeping the newest `keep` of them"""
+
+    def __init__(self, db: DBPersistence, directory: Path, interval: float, keep: int = 5):
+        self.db = db
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="wordspreader-backups", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def snapshot(self) -> Future[BackupResult]:
+        """Starts one snapshot now, the old ones are pruned once it finishes"""
+        stamp = datetime.now(tz=UTC).strftime("%Y%m%dT%H%M%S%fZ")
+        dest = self.directory / f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}"
+        future = self.db.backup(dest)
+        future.add_done_callback(self._prune_after)
+        return future
+
+    def snapshots(self) -> list[Path]:
+        """Newest first"""
+        return sorted(self.directory.glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"), reverse=True)
+
+    def prune(self):
+        for old in self.snapshots()[self.keep :]:
+            log.info("Removing old backup `%s`", old)
+            old.unlink(missing_ok=True)
+
+    def _prune_after(self, future: Future[BackupResult]):
+        if future.exception() is None:
+            self.prune()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.snapshot().result()
+            except Exception:
+                log.exception("Scheduled backup failed")
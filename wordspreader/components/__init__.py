@@ -3,7 +3,12 @@ from collections.abc import Iterable
 
 from flet_core import (
     ButtonStyle,
+    Checkbox,
+    Draggable,
+    DragTarget,
+    DragTargetAcceptEvent,
     FontWeight,
+    Icon,
     IconButton,
     ListTile,
     MaterialState,
@@ -18,6 +23,15 @@ from flet_core import (
 )
 
 log = logging.getLogger(f"{__name__}.Words")
+# Rows can only be dropped on rows of the same group
+DRAG_GROUP = "words"
+# Shared by every row rather than each making its own
+COPY_BUTTON_STYLE = ButtonStyle(
+    color={
+        MaterialState.PRESSED: colors.RED,
+        MaterialState.DEFAULT: colors.WHITE,
+    }
+)
 
 
 class Words(UserControl):
@@ -26,26 +40,48 @@ class Words(UserControl):
     """
 
     def __init__(
-        self, title: str, words: str, tags: Iterable[str], edit_me: callable, delete_me: callable
+        self,
+        title: str,
+        words: str,
+        tags: Iterable[str],
+        edit_me: callable,
+        delete_me: callable,
+        copy_me: callable | None = None,
+        word_id: int | None = None,
+        attach_me: callable | None = None,
+        export_me: callable | None = None,
+        select_me: callable | None = None,
+        move_me: callable | None = None,
+        pin_me: callable | None = None,
+        template_me: callable | None = None,
+        *,
+        pinned: bool = False,
+        templated: bool = False,
     ):
         super().__init__()
+        self.word_id = word_id
+        self.pinned = pinned
+        self.templated = templated
         self._tags = tags if isinstance(tags, set) else set(tags)
         self.edit_me = edit_me
         self.delete_me = delete_me
+        self.copy_me = copy_me
+        self.attach_me = attach_me
+        self.export_me = export_me
+        self.select_me = select_me
+        self.move_me = move_me
+        self.pin_me = pin_me
+        self.template_me = template_me
         self.copy_icon = IconButton(
             icon=icons.COPY_SHARP,
             icon_size=35,
             on_click=self.set_clip,
             tooltip="Copy the text.",
-            style=ButtonStyle(
-                color={
-                    MaterialState.PRESSED: colors.RED,
-                    MaterialState.DEFAULT: colors.WHITE,
-                }
-            ),
+            style=COPY_BUTTON_STYLE,
         )
         self.words_text = Text(value=words, max_lines=1)
         self.title_text = Text(value=title)
+        self.pin_icon = Icon(icons.PUSH_PIN, size=16)
         self.tag_text = Text(
             style=TextThemeStyle.BODY_MEDIUM,
             italic=True,
@@ -53,17 +89,37 @@ class Words(UserControl):
         )
         self.popup_menu = PopupMenuButton(
             items=[
-                PopupMenuItem(text="Edit", on_click=lambda _: self.edit_me(self)),
-                PopupMenuItem(text="Delete", on_click=lambda _: self.delete_me(self)),
+                PopupMenuItem(text="Edit", on_click=self.edit_clicked),
+                PopupMenuItem(text="Delete", on_click=self.delete_clicked),
             ],
         )
+        if self.attach_me is not None:
+            self.popup_menu.items.append(
+                PopupMenuItem(text="Attach files", on_click=self.attach_clicked)
+            )
+        if self.export_me is not None:
+            self.popup_menu.items.append(
+                PopupMenuItem(text="Export attachments", on_click=self.export_clicked)
+            )
+        self.pin_item = PopupMenuItem(on_click=self.pin_clicked)
+        if self.pin_me is not None:
+            self.popup_menu.items.append(self.pin_item)
+        self.template_item = PopupMenuItem(on_click=self.template_clicked)
+        if self.template_me is not None:
+            self.popup_menu.items.append(self.template_item)
+        # Only there when the list supports selecting several words at once
+        self.select_box = Checkbox(value=False, on_change=self.select_changed)
+        leading = self.copy_icon
+        if self.select_me is not None:
+            leading = Row([self.select_box, self.copy_icon], tight=True)
         self.list_tile = ListTile(
-            leading=self.copy_icon,
-            title=Row([self.title_text, self.tag_text]),
+            leading=leading,
+            title=Row([self.pin_icon, self.title_text, self.tag_text]),
             subtitle=self.words_text,
             trailing=self.popup_menu,
         )
         self._render_tags()
+        self._render_flags()
 
     @property
     def words(self):
@@ -100,14 +156,92 @@ class Words(UserControl):
         self._render_tags()
         self.tag_text.update()
 
+    @property
+    def selected(self) -> bool:
+        return bool(self.select_box.value)
+
+    @selected.setter
+    def selected(self, value: bool):
+        # Not sent, this is set while reconciling and goes out with the rest of the rows
+        self.select_box.value = value
+
+    def rebind(
+        self,
+        word_id: int,
+        title: str,
+        words: str,
+        tags: Iterable[str],
+        *,
+        pinned: bool = False,
+        templated: bool = False,
+    ) -> bool:
+        """
+        Points this control at a different, or changed, word without sending anything.
+
+        Returns if anything changed, the caller is in charge of sending the update.
+        """
+        tags = tags if isinstance(tags, set) else set(tags)
+        current = (self.word_id, self.title, self.words, self._tags, self.pinned, self.templated)
+        changed = (word_id, title, words, tags, pinned, templated) != current
+        self.word_id = word_id
+        self.title_text.value = title
+        self.words_text.value = words
+        self._tags = tags
+        self.pinned = pinned
+        self.templated = templated
+        self._render_tags()
+        self._render_flags()
+        return changed
+
     def _render_tags(self):
         self.tag_text.value = ", ".join(sorted(t.title() for t in self.tags))
 
+    def _render_flags(self):
+        self.pin_icon.visible = self.pinned
+        self.pin_item.text = "Unpin" if self.pinned else "Pin to top"
+        self.template_item.text = (
+            "Copy as written" if self.templated else "Fill in {placeholders} when copying"
+        )
+
     def build(self):
-        return self.list_tile
+        if self.move_me is None:
+            return self.list_tile
+        # Dragged by the whole row, dropping it on another puts it in that one's place
+        return DragTarget(
+            group=DRAG_GROUP,
+            content=Draggable(group=DRAG_GROUP, content=self.list_tile, data=self),
+            on_accept=self.drop_accepted,
+        )
+
+    def drop_accepted(self, e: DragTargetAcceptEvent):
+        dragged: Words = self.page.get_control(e.src_id).data
+        if dragged is not self:
+            self.move_me(dragged, self)
+
+    def pin_clicked(self, _):
+        self.pin_me(self)
+
+    def template_clicked(self, _):
+        self.template_me(self)
+
+    def edit_clicked(self, _):
+        self.edit_me(self)
 
     def delete_clicked(self, _):
         self.delete_me(self)
 
+    def attach_clicked(self, _):
+        self.attach_me(self)
+
+    def export_clicked(self, _):
+        self.export_me(self)
+
+    def select_changed(self, _):
+        self.select_me(self, selected=self.selected)
+
     def set_clip(self, _):
-        self.page.set_clipboard(self.words)
+        if self.copy_me is not None:
+            # Lets the app fill in templates and count the use
+            self.copy_me(self)
+        else:
+            self.page.set_clipboard(self.words)
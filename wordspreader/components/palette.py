@@ -0,0 +1,66 @@
+import logging
+
+from flet_core import (
+    AlertDialog,
+    Column,
+    ControlEvent,
+    ListTile,
+    Text,
+    TextField,
+)
+
+from wordspreader.persistence import DBPersistence
+
+log = logging.getLogger(__name__)
+# Matches shown under the search box
+RESULTS_SHOWN = 8
+
+
+# noinspection PyAttributeOutsideInit
+class QuickCopyPalette(AlertDialog):
+    """Type part of a title, typos and all, and press Enter to copy the best match"""
+
+    def __init__(self, db: DBPersistence, copy_title: callable):
+        self.db = db
+        self.copy_title = copy_title
+        self._matches: list[str] = []
+        self._query = TextField(
+            label="Copy a word",
+            autofocus=True,
+            on_change=self.query_changed,
+            on_submit=self.copy_best,
+        )
+        self._results = Column(tight=True)
+        super().__init__(content=Column([self._query, self._results], tight=True, width=400))
+
+    def show(self):
+        self._query.value = ""
+        self._set_matches([])
+        self.open = True
+
+    def close(self, _=None):
+        self.open = False
+        self.update()
+
+    def query_changed(self, e: ControlEvent):
+        # The index lives in memory, a search is quick enough to run on every keystroke
+        self._set_matches(self.db.search_titles(e.control.value or "", RESULTS_SHOWN))
+        self.update()
+
+    def copy_best(self, _=None):
+        if self._matches:
+            self._copy(self._matches[0])
+
+    def _set_matches(self, matches: list[str]):
+        self._matches = matches
+        self._results.controls = [
+            ListTile(title=Text(title), data=title, on_click=self._clicked, dense=True)
+            for title in matches
+        ]
+
+    def _clicked(self, e: ControlEvent):
+        self._copy(e.control.data)
+
+    def _copy(self, title: str):
+        self.close()
+        self.copy_title(title)
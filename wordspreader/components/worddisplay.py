@@ -1,38 +1,165 @@
 import logging
+from collections.abc import Iterable
+from pathlib import Path
 
 from flet_core import (
     Column,
     ControlEvent,
+    IconButton,
+    Row,
     Tab,
     Tabs,
+    Text,
     UserControl,
+    icons,
 )
 
 from wordspreader.components import Words
 from wordspreader.ddl import Word
-from wordspreader.persistence import DBPersistence
+from wordspreader.persistence import ORDER_TYPE, DBPersistence
+from wordspreader.reconcile import RowPool
+from wordspreader.refresh import RefreshScheduler
+from wordspreader.snapshot import dump_snapshot, read_snapshot, write_snapshot
 
 
 # noinspection PyAttributeOutsideInit
 class WordDisplay(UserControl):
     log = logging.getLogger("WordDisplay")
 
-    def __init__(self, db: DBPersistence, edit_word: callable, delete_word: callable):
+    def __init__(
+        self,
+        db: DBPersistence,
+        edit_word: callable,
+        delete_word: callable,
+        copy_word: callable,
+        snapshot_path: Path | None = None,
+        attach_word: callable | None = None,
+        export_word: callable | None = None,
+        delete_selected: callable | None = None,
+        tag_selected: callable | None = None,
+        export_selected: callable | None = None,
+    ):
         super().__init__()
         self.db = db
+        self._copy_callback = copy_word
+        self._attach_callback = attach_word
+        self._export_callback = export_word
+        self.snapshot_path = snapshot_path
+        self._last_snapshot: bytes | None = None
         self._edit_callback = edit_word
         self._delete_callback = delete_word
+        self._bulk_callbacks = (delete_selected, tag_selected, export_selected)
+        # Ids of the checked rows, the bulk actions apply to all of them
+        self.selected: set[int] = set()
+        self.order_by: ORDER_TYPE = "manual"
+        self._pool: RowPool[Words] = RowPool(self._new_word)
+        self.refresher = RefreshScheduler(self._load, self._apply)
 
     def build(self):
-        self.keywords = Tabs(on_change=self.filter_changed, tabs=self._build_keywords())
-        self.words = Column(controls=self._build_all_words())
+        # First paint comes from the snapshot, or is empty, the database is only read once mounted
+        tags, rows = [], []
+        snapshot = read_snapshot(self.snapshot_path) if self.snapshot_path else None
+        if snapshot is not None:
+            tags = snapshot.tags
+            rows = [
+                self._pool.row_for(
+                    row.word_id,
+                    row.name,
+                    row.content,
+                    row.tags,
+                    pinned=row.pinned,
+                    templated=row.templated,
+                )
+                for row in snapshot.rows
+            ]
+        self.keywords = Tabs(on_change=self.filter_changed, tabs=self._build_keywords(tags))
+        self.words = Column(controls=rows)
+        self.selection_count = Text()
+        delete_selected, tag_selected, export_selected = self._bulk_callbacks
+        self.selection_bar = Row(
+            [
+                self.selection_count,
+                IconButton(
+                    icon=icons.LABEL,
+                    tooltip="Change the keywords of the selected words",
+                    on_click=lambda _: tag_selected(self.selected_words()),
+                    visible=tag_selected is not None,
+                ),
+                IconButton(
+                    icon=icons.SAVE_ALT,
+                    tooltip="Export the selected words",
+                    on_click=lambda _: export_selected(self.selected_words()),
+                    visible=export_selected is not None,
+                ),
+                IconButton(
+                    icon=icons.DELETE,
+                    tooltip="Delete the selected words",
+                    on_click=lambda _: delete_selected(self.selected_words()),
+                    visible=delete_selected is not None,
+                ),
+                IconButton(
+                    icon=icons.CLEAR, tooltip="Clear the selection", on_click=self.clear_selection
+                ),
+            ],
+            visible=False,
+        )
 
-        return Column([self.keywords, self.words])
+        return Column([self.keywords, self.selection_bar, self.words])
+
+    def did_mount(self):
+        # Reconcile with the database in the background
+        self.update()
 
     def filter_changed(self, _: ControlEvent):
         self._set_visibility_for_filter()
         super().update()
 
+    def select_word(self, word: Words, *, selected: bool):
+        if selected:
+            self.selected.add(word.word_id)
+        else:
+            self.selected.discard(word.word_id)
+        self._render_selection()
+        self.selection_bar.update()
+
+    def selected_words(self) -> list[Words]:
+        return [w for w in self.words.controls if w.word_id in self.selected]
+
+    def clear_selection(self, _=None):
+        self.selected.clear()
+        for word in self.words.controls:
+            word.selected = False
+        self._render_selection()
+        self.page.update(self, *self.words.controls)
+
+    def _render_selection(self):
+        self.selection_count.value = f"{len(self.selected)} selected"
+        self.selection_bar.visible = bool(self.selected)
+
+    def move_word(self, dragged: Words, target: Words):
+        """Puts the dragged row in the target's place, pinning or unpinning it to match"""
+        controls = self.words.controls
+        index = controls.index(target)
+        if controls.index(dragged) < index:
+            after = target.title
+        else:
+            previous = controls[index - 1] if index else None
+            same_list = previous is not None and previous.pinned == target.pinned
+            after = previous.title if same_list else None
+        if dragged.pinned != target.pinned:
+            self.db.pin_word(dragged.title, pinned=target.pinned)
+        self.db.move_word(dragged.title, after)
+        # Shows where it landed
+        self.set_order("manual")
+
+    def pin_word(self, word: Words):
+        self.db.pin_word(word.title, pinned=not word.pinned)
+        self.update()
+
+    def template_word(self, word: Words):
+        self.db.set_templated(word.title, templated=not word.templated)
+        self.update()
+
     def _set_visibility_for_filter(self):
         match self.keywords.tabs[self.keywords.selected_index].text:
             case "all":
@@ -42,22 +169,39 @@ class WordDisplay(UserControl):
                 for word in self.words.controls:
                     word.visible = s in word.tags
 
-    def _build_keywords(self) -> list[Tab]:
+    @staticmethod
+    def _build_keywords(tags: Iterable[str]) -> list[Tab]:
         tabs = [Tab(text="all")]
-        tabs.extend([Tab(text=t) for t in sorted(self.db.get_all_tags())])
+        tabs.extend([Tab(text=t) for t in sorted(tags)])
         return tabs
 
-    def _build_all_words(self) -> list[Words]:
-        return [
-            Words(
-                word.name,
-                word.content,
-                word.tags,
-                self._edit_callback,
-                self._delete_callback,
-            )
-            for word in self.db.get_words_filtered()
-        ]
+    def _new_word(
+        self,
+        word_id: int,
+        name: str,
+        content: str,
+        tags: Iterable[str],
+        *,
+        pinned: bool = False,
+        templated: bool = False,
+    ) -> Words:
+        return Words(
+            name,
+            content,
+            tags,
+            self._edit_callback,
+            self._delete_callback,
+            self._copy_callback,
+            word_id=word_id,
+            attach_me=self._attach_callback,
+            export_me=self._export_callback,
+            select_me=self.select_word if any(self._bulk_callbacks) else None,
+            move_me=self.move_word,
+            pin_me=self.pin_word,
+            template_me=self.template_word,
+            pinned=pinned,
+            templated=templated,
+        )
 
     @staticmethod
     def _keyword_key(element: Tab):
@@ -70,19 +214,51 @@ class WordDisplay(UserControl):
     def _sort_keywords(self):
         self.keywords.tabs.sort(key=WordDisplay._keyword_key)
 
+    def set_order(self, order_by: ORDER_TYPE):
+        self.order_by = order_by
+        self.update()
+
     def update(self):
-        self._update_tags()
-        self._update_words()
-        super().update()
+        """Asks for a refresh, any requests close together are coalesced into one"""
+        self.refresher.request()
+
+    def _load(self) -> tuple[list[str], list[Word]]:
+        """Runs on the refresh thread, all of the database work happens here"""
+        tags = list(self.db.get_all_tags())
+        return tags, list(self.db.get_words_filtered(order_by=self.order_by))
+
+    def _apply(self, loaded: tuple[list[str], list[Word]]):
+        """Reconciles the controls with what was loaded and sends it all in one update"""
+        if self.page is None:
+            # Not mounted anymore, or yet, `build` will pick up the current state
+            return
+        db_tags, db_words = loaded
+        self._update_tags(db_tags)
+        changed_rows = self._update_words(db_words)
+        self.page.update(self, *changed_rows)
+        self._save_snapshot(db_tags, db_words)
+
+    def _save_snapshot(self, db_tags: list[str], db_words: list[Word]):
+        """Keeps the snapshot for the next launch current, only touching the disk when it changed"""
+        if self.snapshot_path is None:
+            return
+        data = dump_snapshot(db_tags, db_words)
+        if data == self._last_snapshot:
+            return
+        try:
+            write_snapshot(self.snapshot_path, data)
+        except OSError:
+            self.log.exception("Failed to write the snapshot to `%s`", self.snapshot_path)
+            return
+        self._last_snapshot = data
 
-    def _update_tags(self) -> bool:
+    def _update_tags(self, db_tags: list[str]) -> bool:
         ui_tags = {t.text for t in self.keywords.tabs}
-        db_tags = set(self.db.get_all_tags())
         # If either side has something the other side doesn't
         if ui_tags.symmetric_difference(db_tags):
             self.log.debug("Found a difference in tags, updating.")
             old_key = self.keywords.tabs[self.keywords.selected_index].text
-            self.keywords.tabs = self._build_keywords()
+            self.keywords.tabs = self._build_keywords(db_tags)
             self._sort_keywords()
             new_kws = {t.text for t in self.keywords.tabs}
             if old_key in new_kws:
@@ -90,27 +266,27 @@ class WordDisplay(UserControl):
             else:
                 # If we don't have that keyword anymore, we are going to just go to All
                 self.keywords.selected_index = 0
-            self.keywords.update()
             return True
         return False
 
-    def _update_words(self) -> bool:
-        # Do we have all of the keywords and words that exist?
-        ui_words = {w.title: w for w in self.words.controls}
-        db_words = {w.name: w for w in self.db.get_words_filtered()}
-        # If either side has something the other side doesn't
-        if set(ui_words.keys()).symmetric_difference(db_words.keys()):
-            self.log.debug("Found an obvious difference in words, updating.")
-            self.words.controls = self._build_all_words()
-            self.words.update()
-            return True
-        # Are our instances up to date?
-        for word_control in self.words.controls:
-            db_word: Word = db_words[word_control.title]
-            wc: Words = word_control
-            if wc.words != db_word.content:
-                wc.words = db_word.content
-            if set(wc.tags) != db_word.tags:
-                wc.tags = db_word.tags
+    def _update_words(self, db_words: list[Word]) -> list[Words]:
+        """
+        Reconciles the rows with the database by word id, see `wordspreader.reconcile`.
 
-        return False
+        Flet diffs a control's children by identity, so only the inserted, removed or moved rows
+        are sent.
+        Returns the kept rows that changed, they are isolated controls so the column update
+        won't pick up their changes.
+        """
+        reconciled = self._pool.reconcile(self.words.controls, db_words)
+        for word in reconciled.added:
+            # Recycled rows may have been checked for another word
+            word.selected = word.word_id in self.selected
+        # Words that are gone can't stay selected
+        self.selected.intersection_update(w.word_id for w in reconciled.rows)
+        self._render_selection()
+        if reconciled.rows != self.words.controls:
+            self.log.debug("Rows were added, removed or moved, updating.")
+            self.words.controls = reconciled.rows
+        self._set_visibility_for_filter()
+        return reconciled.changed
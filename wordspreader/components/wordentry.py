@@ -15,6 +15,7 @@ from flet_core import (
     TextButton,
     TextField,
     TextThemeStyle,
+    colors,
     icons,
 )
 
@@ -26,9 +27,14 @@ MODE_TYPE = Literal["edit", "new"]
 
 # noinspection PyAttributeOutsideInit
 class WordModal(ft.BottomSheet):
-    def __init__(self, new_word: callable, edit_word: callable):
+    def __init__(
+        self, new_word: callable, edit_word: callable, find_duplicates: callable | None = None
+    ):
         self.new_word = new_word
         self.edit_word = edit_word
+        # content -> names of the words with nearly the same content
+        self.find_duplicates = find_duplicates
+        self._warned_duplicates = False
         self._mode: MODE_TYPE = "new"
         self._editing: Words | None = None
         self.orig_key: str | None = None
@@ -45,11 +51,20 @@ class WordModal(ft.BottomSheet):
         self._tag_display = ResponsiveRow(
             alignment=MainAxisAlignment.START, vertical_alignment=CrossAxisAlignment.START
         )
+        self._duplicate_warning = Text(color=colors.AMBER, visible=False)
         self._fab = FloatingActionButton(
             icon=icons.ADD, on_click=self.save, tooltip="Add the word."
         )
         self.column = Column(
-            [self._header, self._title, self._words, self._tags, self._tag_display, self._fab],
+            [
+                self._header,
+                self._title,
+                self._words,
+                self._tags,
+                self._tag_display,
+                self._duplicate_warning,
+                self._fab,
+            ],
             expand=True,
             horizontal_alignment=CrossAxisAlignment.CENTER,
             tight=True,
@@ -60,6 +75,8 @@ class WordModal(ft.BottomSheet):
     def _reset(self):
         log.debug("Reset called, clearing fields")
         self._editing = None
+        self._warned_duplicates = False
+        self._duplicate_warning.visible = False
         del self.title
         del self.words
         del self.tags
@@ -96,12 +113,30 @@ class WordModal(ft.BottomSheet):
         )
 
     def save(self, _):
+        if self._warn_duplicates():
+            return
         match self._mode:
             case "new":
                 self.add_word()
             case "edit":
                 self.save_edited_word()
 
+    def _warn_duplicates(self) -> bool:
+        """Points out words with nearly the same content once, saving again saves anyway"""
+        if self.find_duplicates is None or self._warned_duplicates or not self.words.strip():
+            return False
+        editing = self._editing.title if self._editing is not None else None
+        similar = [name for name in self.find_duplicates(self.words.strip()) if name != editing]
+        if not similar:
+            return False
+        self._warned_duplicates = True
+        self._duplicate_warning.value = (
+            f"Nearly the same as {', '.join(similar)}. Save again to keep it anyway."
+        )
+        self._duplicate_warning.visible = True
+        self.update()
+        return True
+
     def build(self):
         return self
 
@@ -1,15 +1,85 @@
 from __future__ import annotations
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Table
+import uuid
+import zlib
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Delete,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    Select,
+    String,
+    Table,
+    TypeDecorator,
+    UniqueConstraint,
+    delete,
+    event,
+    exists,
+    inspect,
+    literal_column,
+)
 from sqlalchemy.ext.associationproxy import AssociationProxy, association_proxy
-from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column, relationship
-from sqlalchemy_utils import auto_delete_orphans
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    MappedAsDataclass,
+    Session,
+    UOWTransaction,
+    mapped_column,
+    relationship,
+)
+
+# Content at least this many bytes long is stored compressed, 0 is off. Each library keeps its own
+# in `settings`, opening it puts it here, see `DBPersistence.set_compression`
+COMPRESS_THRESHOLD = 0
+# What turning compression on uses
+DEFAULT_COMPRESS_THRESHOLD = 1024
 
 
 class DuplicateKeyException(BaseException):
     pass
 
 
+class CompressedText(TypeDecorator):
+    """
+    Text that is zlib compressed once it is over `COMPRESS_THRESHOLD` bytes.
+
+    SQLite doesn't care about column types, so short values stay TEXT and stay searchable as is,
+    while the long ones are stored as a BLOB. Reading tells them apart by their storage class.
+
+    It is off unless a library turns it on, as it trades read speed for space. Every long word
+    has to be decompressed when it is read, in `benchmarks/bench_compression.py` the file is about
+    a third smaller but listing all of the words takes a third to four fifths longer.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value: str | None, _dialect) -> str | bytes | None:
+        if value is None or not COMPRESS_THRESHOLD:
+            return value
+        encoded = value.encode("utf-8")
+        if len(encoded) < COMPRESS_THRESHOLD:
+            return value
+        compressed = zlib.compress(encoded)
+        # Not worth it if it barely shrinks
+        return compressed if len(compressed) < len(encoded) else value
+
+    def process_result_value(self, value: str | bytes | None, _dialect) -> str | None:
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode("utf-8")
+        return value
+
+
+def new_uid() -> str:
+    return uuid.uuid4().hex
+
+
 class Base(MappedAsDataclass, DeclarativeBase, eq=True, repr=True, unsafe_hash=True):
     pass
 
@@ -19,6 +89,16 @@ tagging = Table(
     Base.metadata,
     Column("tag_id", Integer, ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True),
     Column("entry_id", Integer, ForeignKey("words.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key covers lookups by tag, this covers the ones by word
+    Index("ix_tagging_entry_id", "entry_id"),
+)
+
+# Per library preferences, by name
+settings = Table(
+    "settings",
+    Base.metadata,
+    Column("name", String, primary_key=True),
+    Column("value", String, nullable=False),
 )
 
 
@@ -32,16 +112,137 @@ class Word(Base):
     __tablename__ = "words"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     name: Mapped[str] = mapped_column(init=True, unique=True)
-    content: Mapped[str]
+    content: Mapped[str] = mapped_column(CompressedText)
+    copy_count: Mapped[int] = mapped_column(default=0, server_default="0", init=False)
+    last_used: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), default=None, init=False
+    )
     tag_objs: Mapped[set[Tag]] = relationship(
         "Tag",
         secondary=tagging,
         backref="words",
         init=False,
-        lazy="joined",
+        # A joined load nests `tagging JOIN tag` in the outer join, which SQLite materializes
+        # with a scan of all of tagging, this looks them up by the entry_id index instead
+        lazy="selectin",
         collection_class=set,
     )
     tags: AssociationProxy[set[str]] = association_proxy("tag_objs", "name")
+    # The same in every library the word is synced to, see `wordspreader.sync`
+    uid: Mapped[str] = mapped_column(String(32), default_factory=new_uid, init=False)
+    # Lamport clock and replica of the last change, stamped by triggers
+    clock: Mapped[int | None] = mapped_column(default=None, init=False)
+    origin: Mapped[str | None] = mapped_column(String(32), default=None, init=False)
+    # When this library last saw it change, peers are sent everything past what they have seen
+    seq: Mapped[int | None] = mapped_column(default=None, init=False)
+    # Place in the manual order, see `wordspreader.ordering`, pinned words come before the rest
+    sort_key: Mapped[str | None] = mapped_column(String, default=None, init=False)
+    pinned: Mapped[bool] = mapped_column(default=False, server_default="0", init=False)
+    # Copying fills in its placeholders, see `wordspreader.templates`, otherwise it copies as is
+    templated: Mapped[bool] = mapped_column(default=False, server_default="0", init=False)
+
+    __table_args__ = (
+        Index("ix_words_manual", pinned.desc(), sort_key, id),
+        Index("ix_words_uid", uid, unique=True),
+        Index("ix_words_seq", seq),
+        Index("ix_words_most_used", copy_count.desc(), last_used.desc()),
+        Index("ix_words_last_used", last_used.desc()),
+        # LIKE is case insensitive, it can only use an index with the same collation
+        Index("ix_words_name_nocase", literal_column("name COLLATE NOCASE")),
+    )
+
+
+class Revision(Base):
+    """One version of a word's content, see `wordspreader.history` for how the payload is stored"""
+
+    __tablename__ = "revision"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
+    word_id: Mapped[int] = mapped_column(ForeignKey("words.id", ondelete="CASCADE"))
+    number: Mapped[int]
+    keyframe: Mapped[bool]
+    payload: Mapped[bytes] = mapped_column(LargeBinary, repr=False)
+    created: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (UniqueConstraint("word_id", "number"),)
+
+
+class Attachment(Base):
+    """
+    A file attached to a word.
+
+    There is deliberately no relationship on `Word`, listing words never touches the file data,
+    which is written and read in chunks with incremental blob I/O, see `wordspreader.attachments`.
+    """
+
+    __tablename__ = "attachment"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
+    word_id: Mapped[int] = mapped_column(ForeignKey("words.id", ondelete="CASCADE"), index=True)
+    filename: Mapped[str]
+    media_type: Mapped[str]
+    size: Mapped[int]
+    data: Mapped[bytes] = mapped_column(LargeBinary, deferred=True, repr=False, init=False)
+
+
+class Signature(Base):
+    """A word's MinHash signature, see `wordspreader.dedupe`"""
+
+    __tablename__ = "signature"
+    word_id: Mapped[int] = mapped_column(
+        ForeignKey("words.id", ondelete="CASCADE"), primary_key=True
+    )
+    data: Mapped[bytes] = mapped_column(LargeBinary, repr=False)
+
+
+# The LSH index, each word is in one bucket per band
+word_lsh = Table(
+    "word_lsh",
+    Base.metadata,
+    Column("band", Integer, nullable=False),
+    Column("bucket", Integer, nullable=False),
+    Column("word_id", Integer, ForeignKey("words.id", ondelete="CASCADE"), nullable=False),
+    Index("ix_word_lsh_bucket", "band", "bucket"),
+    Index("ix_word_lsh_word_id", "word_id"),
+)
+
+
+class Tombstone(Base):
+    """A deleted word, kept so the delete reaches the libraries it is synced with"""
+
+    __tablename__ = "tombstone"
+    uid: Mapped[str] = mapped_column(String(32), primary_key=True)
+    clock: Mapped[int]
+    origin: Mapped[str] = mapped_column(String(32))
+    seq: Mapped[int] = mapped_column(index=True)
+
+
+class SyncPeer(Base):
+    """Another library this one syncs with, and how far into this one's changes it has seen"""
+
+    __tablename__ = "sync_peer"
+    replica: Mapped[str] = mapped_column(String(32), primary_key=True)
+    sent_seq: Mapped[int] = mapped_column(default=0)
+
+
+def _orphan_candidates(session: Session) -> set[int]:
+    """Ids of the tags that lost a word in this flush"""
+    candidates = set()
+    for obj in session.deleted:
+        if isinstance(obj, Word):
+            candidates.update(tag.id for tag in obj.tag_objs)
+    for obj in session.dirty:
+        if isinstance(obj, Word):
+            candidates.update(tag.id for tag in inspect(obj).attrs.tag_objs.history.deleted)
+    return candidates
+
+
+def orphaned_tags(tag_ids: list[int] | Select) -> Delete:
+    """Deletes the tags in `tag_ids` that no word uses anymore"""
+    return delete(Tag).where(Tag.id.in_(tag_ids), ~exists().where(tagging.c.tag_id == Tag.id))
 
 
-auto_delete_orphans(Word.tag_objs)
+@event.listens_for(Session, "after_flush")
+def _delete_orphaned_tags(session: Session, _flush_context: UOWTransaction):
+    # Only the tags that lost a word are checked, not a scan of every tag
+    candidates = _orphan_candidates(session)
+    if candidates:
+        session.execute(orphaned_tags(list(candidates)))
@@ -0,0 +1,111 @@
+"""
+Near-duplicate detection for word contents with MinHash and LSH.
+
+A content's signature is the minimum of each of `NUM_PERM` hash functions over its character
+shingles, and two signatures agree in about the same fraction of places as the Jaccard similarity
+of the shingle sets. The signature is cut into `BANDS` bands, each hashed to a bucket. Contents
+that share any bucket are candidates, and only those get their signatures compared, so a check
+reads a handful of index entries rather than comparing against every word.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import struct
+from collections.abc import Iterable
+
+from sqlalchemy import delete, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from wordspreader.ddl import Signature, word_lsh
+
+# Hash functions in a signature, BANDS * ROWS of them
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+# Characters in a shingle
+SHINGLE = 5
+# Estimated Jaccard similarity at which contents count as near duplicates. With 16 bands of 4
+# rows, contents this similar share a bucket all but always.
+SIMILARITY = 0.8
+# Each shingle is hashed once with SHAKE-128, every 32 bits of its output serve as one of the
+# hash functions, far cheaper than computing each on its own
+_HASHES = struct.Struct(f"<{NUM_PERM}I")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def shingles(content: str) -> set[bytes]:
+    text = _WHITESPACE.sub(" ", content.strip().lower())
+    encoded = text.encode("utf-8")
+    if len(encoded) <= SHINGLE:
+        return {encoded}
+    return {encoded[i : i + SHINGLE] for i in range(len(encoded) - SHINGLE + 1)}
+
+
+def minhash(content: str) -> tuple[int, ...]:
+    rows = [
+        _HASHES.unpack(hashlib.shake_128(shingle).digest(_HASHES.size))
+        for shingle in shingles(content)
+    ]
+    # Column wise minimums, the loops run in C
+    return tuple(map(min, zip(*rows, strict=True)))
+
+
+def similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the contents behind two signatures"""
+    return sum(a == b for a, b in zip(first, second, strict=True)) / NUM_PERM
+
+
+def band_buckets(signature: tuple[int, ...]) -> list[tuple[int, int]]:
+    """(band, bucket) for every band, buckets are signed 64 bit so SQLite can store them"""
+    packed = _HASHES.pack(*signature)
+    width = len(packed) // BANDS
+    buckets = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(packed[band * width : (band + 1) * width], digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+
+def dump_signature(signature: tuple[int, ...]) -> bytes:
+    return _HASHES.pack(*signature)
+
+
+def load_signature(data: bytes) -> tuple[int, ...]:
+    return _HASHES.unpack(data)
+
+
+def index_word(conn: Connection | Session, word_id: int, content: str):
+    """Stores the signature and buckets for the word's content, replacing what it had"""
+    signature = minhash(content)
+    conn.execute(delete(Signature).where(Signature.word_id == word_id))
+    conn.execute(delete(word_lsh).where(word_lsh.c.word_id == word_id))
+    conn.execute(insert(Signature).values(word_id=word_id, data=dump_signature(signature)))
+    conn.execute(
+        insert(word_lsh),
+        [
+            {"band": band, "bucket": bucket, "word_id": word_id}
+            for band, bucket in band_buckets(signature)
+        ],
+    )
+
+
+def clusters(pairs: Iterable[tuple[int, int]]) -> list[set[int]]:
+    """Groups ids linked by any pair, with union find"""
+    parent: dict[int, int] = {}
+
+    def root(node: int) -> int:
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for first, second in pairs:
+        parent[root(first)] = root(second)
+    groups: dict[int, set[int]] = {}
+    for node in parent:
+        groups.setdefault(root(node), set()).add(node)
+    return list(groups.values())
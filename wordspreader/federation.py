@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import cache
+
+from sqlalchemy import (
+    CompoundSelect,
+    MetaData,
+    Select,
+    Table,
+    exists,
+    func,
+    literal,
+    select,
+    union,
+    union_all,
+)
+
+from wordspreader.ddl import Tag, Word, tagging
+
+# The primary, writable library is always the main schema
+PRIMARY = "main"
+SEPARATOR = "\x1f"
+
+
+@dataclass(frozen=True)
+class LibraryWord:
+    library: str
+    name: str
+    content: str
+    tags: frozenset[str]
+
+
+@cache
+def library_tables(schema: str) -> tuple[Table, Table, Table]:
+    """The words, tag and tagging tables as they appear in the attached `schema`"""
+    metadata = MetaData()
+    return (
+        Word.__table__.to_metadata(metadata, schema=schema),
+        Tag.__table__.to_metadata(metadata, schema=schema),
+        tagging.to_metadata(metadata, schema=schema),
+    )
+
+
+def _library_words(schema: str, category: str | None) -> Select:
+    words, tag, tags_for = library_tables(schema)
+    tag_names = (
+        select(func.group_concat(tag.c.name, SEPARATOR))
+        .join(tags_for, tags_for.c.tag_id == tag.c.id)
+        .where(tags_for.c.entry_id == words.c.id)
+        .scalar_subquery()
+    )
+    query = select(
+        literal(schema).label("library"),
+        words.c.name,
+        words.c.content,
+        tag_names.label("tags"),
+    )
+    if category is not None:
+        query = query.where(
+            exists()
+            .where(tags_for.c.entry_id == words.c.id)
+            .where(tags_for.c.tag_id == tag.c.id)
+            .where(tag.c.name == category)
+        )
+    return query
+
+
+def words_query(schemas: list[str], category: str | None = None) -> CompoundSelect:
+    """Every word across the libraries in one statement, optionally only those tagged `category`"""
+    return union_all(*(_library_words(schema, category) for schema in schemas))
+
+
+def tags_query(schemas: list[str]) -> CompoundSelect:
+    """The distinct tag names across the libraries"""
+    return union(*(select(library_tables(schema)[1].c.name) for schema in schemas))
+
+
+def collisions_query(schemas: list[str]) -> Select:
+    """Word names that show up in more than one library, with the libraries they are in"""
+    everything = union_all(
+        *(
+            select(literal(schema).label("library"), library_tables(schema)[0].c.name)
+            for schema in schemas
+        )
+    ).subquery()
+    return (
+        select(everything.c.name, func.group_concat(everything.c.library, SEPARATOR))
+        .group_by(everything.c.name)
+        .having(func.count() > 1)
+        .order_by(everything.c.name)
+    )
+
+
+def to_library_word(row) -> LibraryWord:
+    tags = frozenset(row.tags.split(SEPARATOR)) if row.tags else frozenset()
+    return LibraryWord(library=row.library, name=row.name, content=row.content, tags=tags)
@@ -0,0 +1,234 @@
+"""
+An in memory fuzzy matcher for word titles.
+
+Every title gets a small integer id, and each character bigram has a bitset, a plain Python int,
+of the ids of the titles that contain it. A search adds up the query's bitsets with bit sliced
+counters, so counting the shared bigrams of every title at once is a handful of big int
+operations done in C. Only the titles that share the most, and enough to be within a typo or two,
+get scored as a subsequence match in Python, so a keystroke never loops over every title.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+from collections.abc import Iterable
+from itertools import islice
+
+# Typos allowed for every this many characters of the query
+CHARS_PER_TYPO = 4
+# How many of the titles sharing the most bigrams get scored
+SCORED_CANDIDATES = 200
+# Queries this short are matched as a prefix, they have too few bigrams to go on
+PREFIX_QUERY = 2
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+def _normalize(text: str) -> str:
+    return text.strip().lower()
+
+
+def _bigrams(text: str) -> set[str]:
+    # Padding the start lets a query's first letter count for matching a title's first letter
+    text = f" {text}"
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def _add_to_counters(planes: list[int], bits: int):
+    """Adds one to the bit sliced counters, `planes[k]` is bit k of every title's count"""
+    carry = bits
+    for k, plane in enumerate(planes):
+        planes[k] = plane ^ carry
+        carry &= plane
+        if not carry:
+            return
+    planes.append(carry)
+
+
+def _at_least(planes: list[int], threshold: int, everything: int) -> int:
+    """The bitset of the titles whose count is at least `threshold`"""
+    if threshold.bit_length() > len(planes):
+        return 0
+    greater = 0
+    equal = everything
+    for k in reversed(range(len(planes))):
+        if threshold >> k & 1:
+            equal &= planes[k]
+        else:
+            greater |= equal & planes[k]
+            equal &= ~planes[k]
+    return greater | equal
+
+
+def _bit_positions(bits: int, limit: int) -> list[int]:
+    """Up to `limit` of the set bits, lowest first"""
+    positions = []
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for match in NONZERO_BYTE.finditer(data):
+        base = match.start() * 8
+        byte = data[match.start()]
+        while byte:
+            low = byte & -byte
+            positions.append(base + low.bit_length() - 1)
+            if len(positions) >= limit:
+                return positions
+            byte ^= low
+    return positions
+
+
+def subsequence_score(query: str, title: str) -> int | None:
+    """
+    How well `query` matches `title` as a subsequence, None if it doesn't.
+
+    Both have to be lowercase. Characters in a row and at the start of words score higher.
+    """
+    score = 0
+    position = 0
+    previous = -2
+    for char in query:
+        found = title.find(char, position)
+        if found < 0:
+            return None
+        score += 1
+        if found == previous + 1:
+            score += 4
+        if found == 0 or title[found - 1] in " -_/":
+            score += 3
+        previous = found
+        position = found + 1
+    # Prefer shorter titles when everything else is equal
+    return score * 100 - len(title)
+
+
+class FuzzyIndex:
+    def __init__(self, names: Iterable[str] = ()):
+        self._lock = threading.Lock()
+        self._ids: dict[str, int] = {}
+        self._names: dict[int, str] = {}
+        self._lowered: dict[int, str] = {}
+        self._free_ids: list[int] = []
+        # bigram -> bitset of the ids of the titles that have it
+        self._postings: dict[str, int] = {}
+        self._everything = 0
+        # Sorted lowered names, for prefix queries
+        self._sorted: list[tuple[str, int]] = []
+        self._bulk_add(names)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def _bulk_add(self, names: Iterable[str]):
+        """Builds each bitset once, rather than growing them a title at a time"""
+        positions: dict[str, list[int]] = {}
+        for name in names:
+            if name in self._ids:
+                continue
+            title_id = len(self._ids)
+            self._register(name, title_id)
+            for gram in _bigrams(self._lowered[title_id]):
+                positions.setdefault(gram, []).append(title_id)
+        size = (len(self._ids) + 7) // 8
+        for gram, ids in positions.items():
+            bits = bytearray(size)
+            for title_id in ids:
+                bits[title_id >> 3] |= 1 << (title_id & 7)
+            self._postings[gram] = int.from_bytes(bits, "little")
+        self._everything = (1 << len(self._ids)) - 1
+        self._sorted = sorted((lowered, i) for i, lowered in self._lowered.items())
+
+    def _register(self, name: str, title_id: int):
+        lowered = _normalize(name)
+        self._ids[name] = title_id
+        self._names[title_id] = name
+        self._lowered[title_id] = lowered
+
+    def add(self, name: str):
+        with self._lock:
+            if name in self._ids:
+                return
+            title_id = self._free_ids.pop() if self._free_ids else len(self._ids)
+            self._register(name, title_id)
+            insort(self._sorted, (self._lowered[title_id], title_id))
+            bit = 1 << title_id
+            for gram in _bigrams(self._lowered[title_id]):
+                self._postings[gram] = self._postings.get(gram, 0) | bit
+            self._everything |= bit
+
+    def remove(self, name: str):
+        with self._lock:
+            title_id = self._ids.pop(name, None)
+            if title_id is None:
+                return
+            del self._names[title_id]
+            lowered = self._lowered.pop(title_id)
+            del self._sorted[bisect_left(self._sorted, (lowered, title_id))]
+            bit = 1 << title_id
+            for gram in _bigrams(lowered):
+                posting = self._postings[gram] & ~bit
+                if posting:
+                    self._postings[gram] = posting
+                else:
+                    del self._postings[gram]
+            self._everything &= ~bit
+            self._free_ids.append(title_id)
+
+    def rename(self, old_name: str, new_name: str):
+        self.remove(old_name)
+        self.add(new_name)
+
+    def search(self, query: str, limit: int = 10) -> list[str]:
+        """The best matching titles for `query`, best first"""
+        query = _normalize(query)
+        if not query:
+            return []
+        with self._lock:
+            if len(query) <= PREFIX_QUERY:
+                return self._prefix_search(query, limit)
+            return self._fuzzy_search(query, limit)
+
+    def _prefix_search(self, query: str, limit: int) -> list[str]:
+        start = bisect_left(self._sorted, (query, -1))
+        matches = []
+        for lowered, title_id in islice(self._sorted, start, start + limit):
+            if not lowered.startswith(query):
+                break
+            matches.append(self._names[title_id])
+        return matches
+
+    def _fuzzy_search(self, query: str, limit: int) -> list[str]:
+        grams = _bigrams(query)
+        planes: list[int] = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting:
+                _add_to_counters(planes, posting)
+        # Every typo breaks at most two bigrams
+        needed = max(len(grams) - 2 * (len(query) // CHARS_PER_TYPO), 1)
+        # Take the titles sharing the most bigrams first, lowering the bar until there are enough
+        candidates: list[tuple[int, int]] = []
+        taken = 0
+        for shared in range(len(grams), needed - 1, -1):
+            at_least = _at_least(planes, shared, self._everything)
+            new = at_least & ~taken
+            if new:
+                room = SCORED_CANDIDATES - len(candidates)
+                candidates.extend((title_id, shared) for title_id in _bit_positions(new, room))
+                taken = at_least
+            if len(candidates) >= SCORED_CANDIDATES:
+                break
+
+        scored = []
+        for title_id, shared in candidates:
+            lowered = self._lowered[title_id]
+            score = subsequence_score(query, lowered)
+            if score is None:
+                # Typos aren't subsequences, they rank after those that are, by how close they are
+                scored.append((False, shared * 100 - len(lowered), title_id))
+            else:
+                scored.append((True, score, title_id))
+        return [self._names[title_id] for *_, title_id in heapq.nlargest(limit, scored)]
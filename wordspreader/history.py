@@ -0,0 +1,134 @@
+"""
+Delta encoding for the revision history of a word's content.
+
+Each revision is stored either as a keyframe, the full zlib compressed content, or as a delta
+against the revision before it. A delta is a list of operations where a `[start, end]` pair copies
+that slice of the previous content and a string is inserted as is, which is then JSON encoded and
+compressed. A keyframe is forced every `KEYFRAME_INTERVAL` revisions so rebuilding any revision
+never has to replay more than that many deltas.
+
+Deltas are worked out on words rather than characters, once what both ends share is trimmed off.
+The matching is quadratic at worst and runs while the write lock is held.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import zlib
+from collections.abc import Iterable
+from difflib import SequenceMatcher
+from itertools import accumulate
+
+KEYFRAME_INTERVAL = 16
+# Words with the whitespace after them, what deltas are matched on
+_TOKENS = re.compile(r"\S+\s*|\s+")
+# Past this many tokens in the changed middle it is stored as is rather than matched
+MAX_DELTA_TOKENS = 5000
+
+
+def encode_keyframe(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"))
+
+
+def decode_keyframe(payload: bytes) -> str:
+    return zlib.decompress(payload).decode("utf-8")
+
+
+def _shared_ends(previous: str, content: str) -> tuple[int, int]:
+    """The lengths of the start and, not overlapping it, the end that the two share"""
+    prefix = len(os.path.commonprefix([previous, content]))
+    suffix = len(os.path.commonprefix([previous[prefix:][::-1], content[prefix:][::-1]]))
+    return prefix, suffix
+
+
+def _middle_ops(previous: str, content: str, offset: int) -> list[list[int] | str]:
+    old, new = _TOKENS.findall(previous), _TOKENS.findall(content)
+    if max(len(old), len(new)) > MAX_DELTA_TOKENS:
+        return [content]
+    starts = list(accumulate((len(token) for token in old), initial=offset))
+    ops: list[list[int] | str] = []
+    # Very common words only extend matches rather than start them, which keeps this quick on
+    # ordinary prose and still gives a delta that rebuilds exactly
+    matcher = SequenceMatcher(None, old, new)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        match tag:
+            case "equal":
+                ops.append([starts[i1], starts[i2]])
+            case "replace" | "insert":
+                ops.append("".join(new[j1:j2]))
+            case "delete":
+                pass
+    return ops
+
+
+def encode_delta(previous: str, content: str) -> bytes:
+    prefix, suffix = _shared_ends(previous, content)
+    ops: list[list[int] | str] = []
+    if prefix:
+        ops.append([0, prefix])
+    middle = _middle_ops(
+        previous[prefix : len(previous) - suffix], content[prefix : len(content) - suffix], prefix
+    )
+    ops.extend(op for op in middle if op)
+    if suffix:
+        ops.append([len(previous) - suffix, len(previous)])
+    return zlib.compress(json.dumps(_merged(ops), separators=(",", ":")).encode("utf-8"))
+
+
+def _merged(ops: list[list[int] | str]) -> list[list[int] | str]:
+    """Joins neighbouring copies of one slice, and neighbouring insertions"""
+    merged: list[list[int] | str] = []
+    for op in ops:
+        last = merged[-1] if merged else None
+        if isinstance(op, list) and isinstance(last, list) and last[1] == op[0]:
+            merged[-1] = [last[0], op[1]]
+        elif isinstance(op, str) and isinstance(last, str):
+            merged[-1] = last + op
+        else:
+            merged.append(op)
+    return merged
+
+
+def apply_delta(previous: str, payload: bytes) -> str:
+    parts = []
+    for op in json.loads(zlib.decompress(payload)):
+        match op:
+            case [int() as start, int() as end]:
+                parts.append(previous[start:end])
+            case str():
+                parts.append(op)
+            case _:
+                msg = f"Corrupt delta operation `{op!r}`"
+                raise ValueError(msg)
+    return "".join(parts)
+
+
+def encode_revision(number: int, previous: str | None, content: str) -> tuple[bool, bytes]:
+    """Picks how to store revision `number`, returns if it is a keyframe and the payload"""
+    keyframe = encode_keyframe(content)
+    if previous is None or number % KEYFRAME_INTERVAL == 0:
+        return True, keyframe
+    delta = encode_delta(previous, content)
+    # A complete rewrite can come out bigger as a delta, no reason to store it that way
+    if len(delta) >= len(keyframe):
+        return True, keyframe
+    return False, delta
+
+
+def rebuild(revisions: Iterable[tuple[bool, bytes]]) -> str:
+    """Replays revisions, oldest first and starting at a keyframe, returning the final content"""
+    content: str | None = None
+    for keyframe, payload in revisions:
+        if keyframe:
+            content = decode_keyframe(payload)
+        elif content is None:
+            msg = "Revisions must start with a keyframe"
+            raise ValueError(msg)
+        else:
+            content = apply_delta(content, payload)
+    if content is None:
+        msg = "No revisions to rebuild from"
+        raise ValueError(msg)
+    return content
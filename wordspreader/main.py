@@ -1,3 +1,4 @@
+import json
 import logging
 from pathlib import Path
 
@@ -12,10 +13,14 @@ from flet import (
 )
 from flet_core import (
     AlertDialog,
+    FilePicker,
+    FilePickerResultEvent,
     FloatingActionButton,
+    KeyboardEvent,
     PopupMenuButton,
     PopupMenuItem,
     TextButton,
+    TextField,
     TextThemeStyle,
     colors,
     icons,
@@ -25,12 +30,23 @@ from flet_core.types import (
 )
 from flet_runtime.utils import open_in_browser
 
+from wordspreader.backup import BackupScheduler
 from wordspreader.components import Words
+from wordspreader.components.palette import QuickCopyPalette
 from wordspreader.components.worddisplay import WordDisplay
 from wordspreader.components.wordentry import WordModal
+from wordspreader.ddl import DEFAULT_COMPRESS_THRESHOLD
 from wordspreader.persistence import DBPersistence
+from wordspreader.templates import Template, TemplateCache, builtin_values
 
 log = logging.getLogger(__name__)
+# Hourly snapshots, keeping the last few around
+BACKUP_INTERVAL = 60 * 60
+BACKUPS_KEPT = 5
+
+
+def _split_keywords(value: str | None) -> set[str]:
+    return {keyword.strip() for keyword in (value or "").split(",") if keyword.strip()}
 
 
 # noinspection PyAttributeOutsideInit,PyUnusedLocal
@@ -39,36 +55,192 @@ class WordSpreader(UserControl):
         self.bs.setup_edit_word(word)
 
     def setup_delete_word(self, word: Words):
-        self._to_delete = word
+        self.setup_delete_words([word])
+
+    def setup_delete_words(self, words: list[Words]):
+        self._to_delete = words
+        self.page.dialog = self.alert_dialog
         self.alert_dialog.open = True
-        self.alert_dialog.content = Column(
-            [
-                Text(value=word.title),
-                Text(value=word.words),
-                word._render_tags(),
-            ],
-            tight=True,
-        )
+        if len(words) == 1:
+            (word,) = words
+            controls = [Text(value=word.title), Text(value=word.words), word._render_tags()]
+        else:
+            controls = [
+                Text(value=f"{len(words)} words:"),
+                Text(value=", ".join(w.title for w in words)),
+            ]
+        self.alert_dialog.content = Column(controls, tight=True)
         self.alert_dialog.update()
         self.page.update()
 
     def delete_word_and_cleanup(self, _=None):
         try:
-            self.db.delete_word(self._to_delete.title)
+            # One statement however many there are
+            self.db.delete_words([word.title for word in self._to_delete])
+            for word in self._to_delete:
+                self.templates.discard(word.word_id)
         finally:
-            self._to_delete = None
+            self._to_delete = []
         self.word_display.update()
         self.close_alert_dialog()
 
-    def __init__(self, db: DBPersistence):
+    def setup_tag_words(self, words: list[Words]):
+        self._to_tag = words
+        self.tag_dialog.content = Column(
+            [
+                Text(value=f"{len(words)} words"),
+                TextField(label="Keywords to add", helper_text="Separated by commas"),
+                TextField(label="Keywords to remove", helper_text="Separated by commas"),
+            ],
+            tight=True,
+        )
+        self.page.dialog = self.tag_dialog
+        self.tag_dialog.open = True
+        self.page.update()
+
+    def tag_words(self, _=None):
+        _, add, remove = self.tag_dialog.content.controls
+        self.db.tag_words(
+            [word.title for word in self._to_tag],
+            add=_split_keywords(add.value),
+            remove=_split_keywords(remove.value),
+        )
+        self.close_tag_dialog()
+        self.word_display.update()
+
+    def close_tag_dialog(self, _=None):
+        self._to_tag = []
+        self.tag_dialog.open = False
+        self.tag_dialog.update()
+
+    def setup_export_words(self, words: list[Words]):
+        self._to_export = words
+        self.words_export_picker.save_file(
+            dialog_title=f"Export {len(words)} words", file_name="words.json"
+        )
+
+    def export_words_picked(self, e: FilePickerResultEvent):
+        words, self._to_export = self._to_export, []
+        if not e.path:
+            return
+        # JSON is YAML too, so "Load Examples" style loading reads it back
+        exported = self.db.export_words([word.title for word in words])
+        Path(e.path).write_text(json.dumps({"words": exported}, indent=2))
+
+    def copy_word(self, word: Words):
+        self.copy_text(word.word_id, word.title, word.words, templated=word.templated)
+
+    def copy_title(self, title: str):
+        word = self.db.get_word(title)
+        self.copy_text(word.id, word.name, word.content, templated=word.templated)
+
+    def copy_text(self, word_id: int, title: str, content: str, *, templated: bool):
+        """Copies the word, asking for any template fields that need filling in first"""
+        if not templated:
+            self.page.set_clipboard(content)
+            self.db.record_use(title)
+            return
+        template = self.templates.get(word_id, content)
+        if template.prompts:
+            self.setup_prompts(title, content, template)
+            return
+        self._copy_rendered(title, content, template, {})
+
+    def setup_prompts(self, title: str, content: str, template: Template):
+        self._prompting = (title, content, template)
+        self.prompt_dialog.content = Column(
+            [
+                TextField(label=field, value=self._last_answers.get(field, ""), data=field)
+                for field in template.prompts
+            ],
+            tight=True,
+        )
+        self.page.dialog = self.prompt_dialog
+        self.prompt_dialog.open = True
+        self.page.update()
+
+    def copy_prompted(self, _=None):
+        title, content, template = self._prompting
+        answers = {field.data: field.value for field in self.prompt_dialog.content.controls}
+        self._last_answers.update(answers)
+        self._copy_rendered(title, content, template, answers)
+        self.close_prompt_dialog()
+
+    def close_prompt_dialog(self, _=None):
+        self._prompting = None
+        self.prompt_dialog.open = False
+        self.prompt_dialog.update()
+
+    def _copy_rendered(self, title: str, content: str, template: Template, answers: dict[str, str]):
+        if template.is_plain:
+            text = content
+        else:
+            text = template.render(builtin_values(title) | answers)
+        self.page.set_clipboard(text)
+        self.db.record_use(title)
+
+    def open_palette(self):
+        self.palette.show()
+        self.page.dialog = self.palette
+        self.page.update()
+
+    def key_pressed(self, e: KeyboardEvent):
+        if e.key.upper() == "K" and (e.ctrl or e.meta):
+            self.open_palette()
+
+    def setup_attach(self, word: Words):
+        self._attaching = word
+        self.attach_picker.pick_files(dialog_title=f"Attach to {word.title}", allow_multiple=True)
+
+    def attach_picked(self, e: FilePickerResultEvent):
+        word, self._attaching = self._attaching, None
+        for picked in e.files or []:
+            # Streamed into the database in chunks, large files are never read in whole
+            self.db.add_attachment_file(word.title, Path(picked.path))
+
+    def setup_export(self, word: Words):
+        self._exporting = word
+        self.export_picker.get_directory_path(dialog_title=f"Export from {word.title}")
+
+    def export_picked(self, e: FilePickerResultEvent):
+        word, self._exporting = self._exporting, None
+        if not e.path:
+            return
+        for attachment in self.db.list_attachments(word.title):
+            with (Path(e.path) / attachment.filename).open("wb") as dest:
+                self.db.export_attachment(attachment.id, dest)
+
+    def __init__(self, db: DBPersistence, snapshot_path: Path | None = None):
         super().__init__()
 
         self.db = db
-        self.word_display = WordDisplay(self.db, self.setup_edit_word, self.setup_delete_word)
-        self.bs = WordModal(self.new_word, self.db.update_word)
+        self.templates = TemplateCache()
+        self.word_display = WordDisplay(
+            self.db,
+            self.setup_edit_word,
+            self.setup_delete_word,
+            self.copy_word,
+            snapshot_path,
+            attach_word=self.setup_attach,
+            export_word=self.setup_export,
+            delete_selected=self.setup_delete_words,
+            tag_selected=self.setup_tag_words,
+            export_selected=self.setup_export_words,
+        )
+        self.attach_picker = FilePicker(on_result=self.attach_picked)
+        self.export_picker = FilePicker(on_result=self.export_picked)
+        self.words_export_picker = FilePicker(on_result=self.export_words_picked)
+        self.sync_picker = FilePicker(on_result=self.sync_picked)
+        self._to_export: list[Words] = []
+        self._attaching: Words | None = None
+        self._exporting: Words | None = None
+        self.palette = QuickCopyPalette(self.db, self.copy_title)
+        self.bs = WordModal(self.new_word, self.db.update_word, self.find_duplicates)
         self.fab = FloatingActionButton(
             icon=icons.ADD, bgcolor=colors.BLUE, on_click=self.bs.setup_new_word
         )
+        self.compress_item = PopupMenuItem(on_click=self.toggle_compression)
+        self._render_compression()
         self.popup = PopupMenuButton(
             items=[
                 PopupMenuItem(
@@ -76,6 +248,28 @@ class WordSpreader(UserControl):
                     on_click=self.show_db_file_in_file_browser,
                 ),
                 PopupMenuItem(text="Load Examples", on_click=self.load_examples),
+                PopupMenuItem(text="Back up now", on_click=self.backup_now),
+                PopupMenuItem(text="Sync with another library", on_click=self.setup_sync),
+                PopupMenuItem(text="Find near duplicates", on_click=self.show_duplicates),
+                self.compress_item,
+                PopupMenuItem(text="Quick copy (Ctrl+K)", on_click=lambda _: self.open_palette()),
+                PopupMenuItem(),
+                PopupMenuItem(
+                    text="Sort manually (drag to reorder)",
+                    on_click=lambda _: self.word_display.set_order("manual"),
+                ),
+                PopupMenuItem(
+                    text="Sort by order added",
+                    on_click=lambda _: self.word_display.set_order("inserted"),
+                ),
+                PopupMenuItem(
+                    text="Sort by most used",
+                    on_click=lambda _: self.word_display.set_order("most_used"),
+                ),
+                PopupMenuItem(
+                    text="Sort by recently used",
+                    on_click=lambda _: self.word_display.set_order("recently_used"),
+                ),
                 # Debug option, not intended to be available normally
                 # PopupMenuItem(text="Wipe DB", on_click=self.wipe_db),
             ],
@@ -88,7 +282,29 @@ class WordSpreader(UserControl):
                 TextButton("No", on_click=self.close_alert_dialog),
             ],
         )
-        self._to_delete: Words | None = None
+        self._to_delete: list[Words] = []
+        self.tag_dialog = AlertDialog(
+            title=Text("Change keywords"),
+            actions=[
+                TextButton("Apply", on_click=self.tag_words),
+                TextButton("Cancel", on_click=self.close_tag_dialog),
+            ],
+        )
+        self._to_tag: list[Words] = []
+        self.report_dialog = AlertDialog(
+            title=Text("Words with nearly the same content"),
+            actions=[TextButton("Close", on_click=self.close_report_dialog)],
+        )
+        self.prompt_dialog = AlertDialog(
+            title=Text("Fill in the blanks"),
+            actions=[
+                TextButton("Copy", on_click=self.copy_prompted),
+                TextButton("Cancel", on_click=self.close_prompt_dialog),
+            ],
+        )
+        self._prompting: tuple[str, str, Template] | None = None
+        # Answers are remembered for the session, so `{name}` is only typed once
+        self._last_answers: dict[str, str] = {}
 
     def close_bs(self, _=None):
         self.bs.open = False
@@ -114,8 +330,12 @@ class WordSpreader(UserControl):
     def did_mount(self):
         self.page.floating_action_button = self.fab
         self.page.overlay.append(self.bs)
+        self.page.overlay.extend(
+            [self.attach_picker, self.export_picker, self.words_export_picker, self.sync_picker]
+        )
         self.page.dialog = self.alert_dialog
         self.page.add(self.fab, self.alert_dialog)
+        self.page.on_keyboard_event = self.key_pressed
 
     # noinspection PyPropertyDefinition
     @classmethod
@@ -124,6 +344,18 @@ class WordSpreader(UserControl):
         dirs = appdirs.AppDirs("WordSpreader", "mriswithe")
         return Path(dirs.user_data_dir) / "wordspreader.sqlite3"
 
+    # noinspection PyPropertyDefinition
+    @classmethod
+    @property
+    def default_snapshot_path(cls) -> Path:
+        return cls.default_db_path.with_suffix(".snapshot")
+
+    # noinspection PyPropertyDefinition
+    @classmethod
+    @property
+    def default_backup_dir(cls) -> Path:
+        return cls.default_db_path.parent / "backups"
+
     def build(self):
         # application's root control (i.e. "view") containing all other controls
         return Column(
@@ -140,8 +372,9 @@ class WordSpreader(UserControl):
         )
 
     def update(self):
+        # Only the list changes along with the data, and it sends itself once its debounced
+        # refresh is done, so the several calls one action can make turn into one page update
         self.word_display.update()
-        super().update()
 
     def new_word(self, title: str, words: str, tags: set[str] | None = None):
         self.db.new_word(title, words, tags)
@@ -164,15 +397,76 @@ class WordSpreader(UserControl):
                     self.db.new_word(title, words, set(tags))
         self.update()
 
+    def find_duplicates(self, content: str) -> list[str]:
+        return [name for name, _ in self.db.find_near_duplicates(content)]
+
+    def show_duplicates(self, _):
+        groups = self.db.duplicate_clusters()
+        self.report_dialog.content = Column(
+            [Text(value=", ".join(group)) for group in groups]
+            or [Text(value="No near duplicates found")],
+            tight=True,
+            scroll="auto",
+        )
+        self.page.dialog = self.report_dialog
+        self.report_dialog.open = True
+        self.page.update()
+
+    def close_report_dialog(self, _=None):
+        self.report_dialog.open = False
+        self.report_dialog.update()
+
+    def setup_sync(self, _):
+        self.sync_picker.pick_files(
+            dialog_title="Library to sync with", allowed_extensions=["sqlite3"]
+        )
+
+    def sync_picked(self, e: FilePickerResultEvent):
+        if not e.files:
+            return
+        other = DBPersistence.from_file(Path(e.files[0].path))
+        try:
+            result = self.db.sync_with(other)
+        finally:
+            other.close()
+            other.engine.dispose()
+        log.info(
+            "Synced with `%s`, sent %d and received %d changes, %d conflicts",
+            e.files[0].path,
+            result.sent,
+            result.received,
+            len(result.conflicts),
+        )
+        self.word_display.update()
+
+    def backup_now(self, _):
+        _backups.snapshot()
+
+    def toggle_compression(self, _):
+        # Rewrites every long word, so the file shrinks, or grows, right away
+        self.db.set_compression(0 if self.db.compress_threshold else DEFAULT_COMPRESS_THRESHOLD)
+        self._render_compression()
+        self.popup.update()
+
+    def _render_compression(self):
+        if self.db.compress_threshold:
+            self.compress_item.text = "Store long words uncompressed"
+        else:
+            self.compress_item.text = "Compress long words (smaller file, slower listing)"
+
     def wipe_db(self, _):
         from wordspreader.ddl import Base
+        from wordspreader.migrations import migrate
 
         Base.metadata.drop_all(self.db.engine)
-        Base.metadata.create_all(self.db.engine)
+        # Puts back the sync triggers along with the tables
+        migrate(self.db.engine)
         self.update()
 
 
 _db = WordSpreader.default_app_dir_db()
+_backups = BackupScheduler(_db, WordSpreader.default_backup_dir, BACKUP_INTERVAL, BACKUPS_KEPT)
+_backups.start()
 
 
 def main(page: Page):
@@ -180,9 +474,12 @@ def main(page: Page):
     page.horizontal_alignment = "center"
     page.scroll = "adaptive"
     # create application instance
-    app = WordSpreader(_db)
+    app = WordSpreader(_db, WordSpreader.default_snapshot_path)
     # add application's root control to the page
     page.add(app)
 
 
 flet.app(target=main)
+_backups.stop()
+# Write out the usage counters that have not been flushed yet
+_db.close()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections.abc import Callable
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from wordspreader import sync
+from wordspreader.ddl import Base, Word
+from wordspreader.dedupe import index_word
+from wordspreader.ordering import spaced_keys
+
+log = logging.getLogger(__name__)
+
+# Kept out of `Base.metadata` so dropping or clearing the app's tables never touches it
+version_table = Table(
+    "schema_version", MetaData(), Column("version", Integer, nullable=False, primary_key=True)
+)
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _add_usage_columns(conn: Connection):
+    columns = _columns(conn, "words")
+    if "copy_count" not in columns:
+        conn.exec_driver_sql("ALTER TABLE words ADD COLUMN copy_count INTEGER NOT NULL DEFAULT 0")
+    if "last_used" not in columns:
+        conn.exec_driver_sql("ALTER TABLE words ADD COLUMN last_used DATETIME")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_words_most_used ON words (copy_count DESC, last_used DESC)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_words_last_used ON words (last_used DESC)")
+
+
+def _add_lookup_indexes(conn: Connection):
+    # The primary key covers lookups by tag, this covers the ones by word
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_tagging_entry_id ON tagging (entry_id)")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_words_name_nocase ON words (name COLLATE NOCASE)"
+    )
+
+
+def _name_uid(name: str) -> str:
+    return hashlib.blake2b(name.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _add_sync_columns(conn: Connection):
+    columns = _columns(conn, "words")
+    added = {"uid": "VARCHAR(32)", "clock": "INTEGER", "origin": "VARCHAR(32)", "seq": "INTEGER"}
+    for column, kind in added.items():
+        if column not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE words ADD COLUMN {column} {kind}")
+    # From the name, so copies of one library that are each migrated agree on who is who
+    uids = [
+        {"id": word_id, "uid": _name_uid(name)}
+        for word_id, name in conn.exec_driver_sql("SELECT id, name FROM words WHERE uid IS NULL")
+    ]
+    if uids:
+        conn.execute(text("UPDATE words SET uid = :uid WHERE id = :id"), uids)
+    # Everything that is already there counts as one change, made here
+    conn.exec_driver_sql(
+        "UPDATE words SET clock = 1, seq = 1, origin = (SELECT id FROM sync_replica) "
+        "WHERE clock IS NULL"
+    )
+    conn.exec_driver_sql("UPDATE sync_replica SET clock = max(clock, 1), seq = max(seq, 1)")
+    conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ix_words_uid ON words (uid)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_words_seq ON words (seq)")
+
+
+def _index_near_duplicates(conn: Connection):
+    words = Word.__table__
+    for word_id, content in conn.execute(select(words.c.id, words.c.content)).all():
+        index_word(conn, word_id, content)
+
+
+def _add_manual_order(conn: Connection):
+    columns = _columns(conn, "words")
+    if "sort_key" not in columns:
+        conn.exec_driver_sql("ALTER TABLE words ADD COLUMN sort_key VARCHAR")
+    if "pinned" not in columns:
+        conn.exec_driver_sql("ALTER TABLE words ADD COLUMN pinned BOOLEAN NOT NULL DEFAULT 0")
+    # The order they were listed in until now
+    query = "SELECT id FROM words WHERE sort_key IS NULL ORDER BY id"
+    ids = conn.exec_driver_sql(query).scalars().all()
+    if ids:
+        conn.execute(
+            text("UPDATE words SET sort_key = :sort_key WHERE id = :id"),
+            [{"id": i, "sort_key": key} for i, key in zip(ids, spaced_keys(len(ids)), strict=True)],
+        )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_words_manual ON words (pinned DESC, sort_key, id)"
+    )
+
+
+def _add_template_flag(conn: Connection):
+    # Off for everything already there, those were written to be copied exactly as they are
+    if "templated" not in _columns(conn, "words"):
+        conn.exec_driver_sql("ALTER TABLE words ADD COLUMN templated BOOLEAN NOT NULL DEFAULT 0")
+
+
+# In order, a database at version N has had the first N of these run. Only ever append to this.
+# New tables don't need one, `create_all` makes them, only changes to existing tables do.
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    _add_usage_columns,
+    _add_lookup_indexes,
+    _add_sync_columns,
+    _index_near_duplicates,
+    _add_manual_order,
+    _add_template_flag,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(engine: Engine) -> int:
+    """Brings the database up to `SCHEMA_VERSION`, returns the version it started at"""
+    with engine.begin() as conn:
+        existing = inspect(conn).has_table("words")
+        version_table.create(conn, checkfirst=True)
+        version = conn.scalar(select(version_table.c.version))
+        Base.metadata.create_all(conn)
+        if version is None:
+            # A brand new database was just made at the latest version, anything else predates
+            # versioning and needs everything run
+            version = 0 if existing else SCHEMA_VERSION
+            conn.execute(version_table.insert().values(version=version))
+        # Idempotent, and the migrations can count on it
+        sync.install(conn)
+        started_at = version
+        for migration in MIGRATIONS[version:]:
+            version += 1
+            log.info("Migrating the database to version %d with `%s`", version, migration.__name__)
+            migration(conn)
+            conn.execute(version_table.update().values(version=version))
+    return started_at
@@ -0,0 +1,151 @@
+"""
+Fractional sort keys for the manual order.
+
+A key is an integer part followed by a fraction, both in base 62 digits, and keys sort as plain
+strings. The integer part's first character gives how many digits it has, `a` to `z` for one to
+26 and `Z` down to `A` for negative numbers, so adding one to it at the end of the list only
+needs another character every so many words. Between any two keys there is always another, its
+fraction taking a digit more when it has to, so moving a word only rewrites that word's key,
+never its neighbours'. Fractions never end in the lowest digit, which keeps room below every key.
+
+Repeatedly putting words in the same gap makes keys longer, a rebalance spaces them out again.
+"""
+
+from __future__ import annotations
+
+# In ASCII order, so SQLite's binary collation sorts keys the same way Python does
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+# The key of the first word in an empty list
+FIRST_KEY = "a" + DIGITS[0]
+# The lowest integer part, only keys with a fraction after it can go below it
+_SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+# Past this many characters the keys are due a rebalance
+REBALANCE_LENGTH = 12
+
+
+def _digit(key: str, position: int) -> int:
+    return DIGITS.index(key[position]) if position < len(key) else 0
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    msg = f"`{head}` doesn't start a sort key"
+    raise ValueError(msg)
+
+
+def _split(key: str) -> tuple[str, str]:
+    """The integer part and the fraction"""
+    length = _integer_length(key[0])
+    integer, fraction = key[:length], key[length:]
+    if len(integer) < length or key == _SMALLEST_INTEGER or fraction.endswith(DIGITS[0]):
+        msg = f"`{key}` isn't a sort key"
+        raise ValueError(msg)
+    return integer, fraction
+
+
+def _midpoint(low: str, high: str | None) -> str:
+    """A fraction between `low` and `high`, `""` is the lowest and None is past the highest"""
+    if high is not None:
+        # Whatever they share is kept, the rest is between what follows it
+        shared = 0
+        while shared < len(high) and _digit(low, shared) == _digit(high, shared):
+            shared += 1
+        if shared:
+            return high[:shared] + _midpoint(low[shared:], high[shared:])
+    low_digit = _digit(low, 0)
+    high_digit = DIGITS.index(high[0]) if high is not None else BASE
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit) // 2]
+    # Adjacent digits
+    if high is not None and len(high) > 1:
+        return high[0]
+    return DIGITS[low_digit] + _midpoint(low[1:], None)
+
+
+def _increment(integer: str) -> str | None:
+    """The next integer part, None past the largest"""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[i]) + 1
+        if digit < BASE:
+            digits[i] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+    # Every digit carried, one more of them
+    if head == "Z":
+        return FIRST_KEY
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement(integer: str) -> str | None:
+    """The previous integer part, None below the smallest"""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[i]) - 1
+        if digit >= 0:
+            digits[i] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    # Every digit borrowed, one more of them
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(before: str | None, after: str | None) -> str:
+    """A key that sorts after `before` and before `after`, None leaves that side open"""
+    if before is not None and after is not None and before >= after:
+        msg = f"`{before}` has to sort before `{after}`"
+        raise ValueError(msg)
+    if before is None and after is None:
+        return FIRST_KEY
+    if before is None:
+        integer, fraction = _split(after)
+        if integer == _SMALLEST_INTEGER:
+            return integer + _midpoint("", fraction)
+        if fraction:
+            return integer
+        previous = _decrement(integer)
+        if previous is None:
+            msg = "Ran out of sort keys at the start"
+            raise ValueError(msg)
+        return previous
+    integer, fraction = _split(before)
+    if after is None:
+        following = _increment(integer)
+        return integer + _midpoint(fraction, None) if following is None else following
+    after_integer, after_fraction = _split(after)
+    if integer == after_integer:
+        return integer + _midpoint(fraction, after_fraction)
+    following = _increment(integer)
+    if following is not None and following < after:
+        return following
+    return integer + _midpoint(fraction, None)
+
+
+def spaced_keys(count: int) -> list[str]:
+    """`count` keys one integer apart, as short as they can be"""
+    keys = []
+    key = FIRST_KEY
+    for _ in range(count):
+        keys.append(key)
+        key = _increment(key)
+    return keys
@@ -1,35 +1,231 @@
 from __future__ import annotations
 
-from collections.abc import Iterator
+import json
+import logging
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import UTC, datetime
 from itertools import chain
 from pathlib import Path
+from typing import BinaryIO, Literal, TypeVar
 
-from sqlalchemy import create_engine, delete, select
-from sqlalchemy.engine import Engine
+from sqlalchemy import (
+    LargeBinary,
+    and_,
+    bindparam,
+    cast,
+    create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.orm import (
     Session,
 )
+from sqlalchemy.sql import Select
+
+from wordspreader import ddl
+from wordspreader.attachments import CHUNK_SIZE, read_attachment, write_attachment
+from wordspreader.backup import PAGES_PER_STEP, BackupResult, copy_database, run_backup
+from wordspreader.ddl import (
+    DEFAULT_COMPRESS_THRESHOLD,
+    Attachment,
+    CompressedText,
+    DuplicateKeyException,
+    Revision,
+    Signature,
+    SyncPeer,
+    Tag,
+    Tombstone,
+    Word,
+    orphaned_tags,
+    settings,
+    tagging,
+    word_lsh,
+)
+from wordspreader.dedupe import (
+    SIMILARITY,
+    band_buckets,
+    clusters,
+    index_word,
+    load_signature,
+    minhash,
+    similarity,
+)
+from wordspreader.federation import (
+    PRIMARY,
+    SEPARATOR,
+    LibraryWord,
+    collisions_query,
+    tags_query,
+    to_library_word,
+    words_query,
+)
+from wordspreader.fuzzy import FuzzyIndex
+from wordspreader.history import KEYFRAME_INTERVAL, encode_revision, rebuild
+from wordspreader.migrations import migrate
+from wordspreader.ordering import REBALANCE_LENGTH, key_between, spaced_keys
+from wordspreader.sync import Change, Changeset, SyncResult, collision_name, replica_table
+from wordspreader.transactions import configure_transactions, retry_when_locked
+from wordspreader.usage import UsageTracker
+
+log = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+ORDER_TYPE = Literal["inserted", "most_used", "recently_used", "manual"]
+# How often the buffered usage counters are written out when running against a file
+USAGE_FLUSH_INTERVAL = 5.0
+# Words per page when listing them a page at a time
+PAGE_SIZE = 50
+# The name of the compression threshold in `settings`
+COMPRESS_SETTING = "compress_threshold"
 
-from wordspreader.ddl import Base, DuplicateKeyException, Tag, Word
+
+def _json_values(values: Iterable[str]) -> Select:
+    """
+    The values as a one column subquery, sent as a single JSON array.
+
+    Any number of them fits in the one bound parameter, an `IN` list would need one each.
+    """
+    table = func.json_each(json.dumps(list(values))).table_valued("value")
+    return select(table.c.value)
+
+
+def _enable_foreign_keys(dbapi_connection, _connection_record):
+    # SQLite leaves these off by default, we need them for the ON DELETE CASCADEs
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
 
 
 class DBPersistence:
-    def __init__(self, engine: Engine):
+    def __init__(self, engine: Engine, usage_flush_interval: float | None = None):
         self.engine = engine
-        Base.metadata.create_all(self.engine)
+        event.listen(self.engine, "connect", _enable_foreign_keys)
+        # alias -> file of the other libraries mounted next to this one
+        self._libraries: dict[str, Path] = {}
+        event.listen(self.engine, "checkout", self._sync_attached)
+        # Everything that writes goes through this one, on connections that never have the other
+        # libraries attached, see `wordspreader.transactions`. An in memory database only exists
+        # on its own connection, so there it has to be shared.
+        writer = None
+        if not self.in_memory:
+            writer = create_engine(self.engine.url)
+            event.listen(writer, "connect", _enable_foreign_keys)
+        self.writer = configure_transactions(self.engine, writer)
+        migrate(self.writer)
+        ddl.COMPRESS_THRESHOLD = self.compress_threshold
+        self.usage = UsageTracker(self.writer, usage_flush_interval)
+        # Backups and rebalancing the manual order run on this, one at a time
+        self._executor: ThreadPoolExecutor | None = None
+        self._rebalance_pending = False
+        self._title_index: FuzzyIndex | None = None
 
     @classmethod
     def from_file(cls, db_file: Path):
-        return cls(create_engine(f"sqlite:///{db_file.resolve().absolute()}"))
+        return cls(
+            create_engine(f"sqlite:///{db_file.resolve().absolute()}"),
+            usage_flush_interval=USAGE_FLUSH_INTERVAL,
+        )
+
+    def close(self):
+        """Writes out anything still buffered in memory and waits on running background work"""
+        self.usage.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.writer.pool is not self.engine.pool:
+            self.writer.dispose()
+
+    @property
+    def in_memory(self) -> bool:
+        return self.engine.url.database in (None, "", ":memory:")
+
+    def backup(self, dest: Path, pages_per_step: int = PAGES_PER_STEP) -> Future[BackupResult]:
+        """
+        Copies the live database to `dest` with the SQLite online backup API, on a background
+        thread.
 
+        Only `pages_per_step` pages are locked at a time, so the app keeps working during the copy.
+        In memory databases are tied to their thread, so those are backed up before returning.
+        """
+        self.usage.flush()
+        return self._in_background(self._backup, dest, pages_per_step)
+
+    def _in_background(self, task: Callable[..., R], *args) -> Future[R]:
+        """Runs `task` on the background thread, or before returning for in memory databases"""
+        if self.in_memory:
+            future: Future[R] = Future()
+            try:
+                future.set_result(task(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="wordspreader-background"
+            )
+        return self._executor.submit(task, *args)
+
+    def restore(self, src: Path, pages_per_step: int = PAGES_PER_STEP):
+        """Replaces the contents of the database with the backup at `src`"""
+        source = sqlite3.connect(f"file:{src.resolve()}?mode=ro", uri=True)
+        try:
+            (check,) = source.execute("PRAGMA quick_check").fetchone()
+            if check != "ok":
+                msg = f"Refusing to restore from `{src}`, it failed its integrity check: {check}"
+                raise RuntimeError(msg)
+            self.usage.flush()
+            raw = self.engine.raw_connection()
+            try:
+                pages, seconds = copy_database(source, raw.driver_connection, pages_per_step)
+            finally:
+                raw.close()
+        finally:
+            source.close()
+        # The backup may predate some of the migrations, or have compression set differently
+        migrate(self.writer)
+        ddl.COMPRESS_THRESHOLD = self.compress_threshold
+        # Everything may have changed, it is rebuilt the next time it is needed
+        self._title_index = None
+        log.info("Restored %d pages from `%s` in %.3fs", pages, src, seconds)
+
+    def _backup(self, dest: Path, pages_per_step: int) -> BackupResult:
+        raw = self.engine.raw_connection()
+        try:
+            return run_backup(raw.driver_connection, dest, pages_per_step)
+        finally:
+            raw.close()
+
+    @retry_when_locked
     def new_word(self, name: str, content: str, tags: set[str] | None = None) -> Word:
-        with self._get_session() as session:
-            db_tags = self.resolve_tags(tags, session)
+        with self._write_session() as session:
+            db_tags = self.resolve_tags(tags or set(), session)
+            sort_key = self._append_key(session)
             word = Word(name=name, content=content, tags={})
             word.tag_objs = db_tags
+            word.sort_key = sort_key
             session.add(word)
+            session.flush()
+            self._record_revision(session, word.id, None, content)
+            index_word(session, word.id, content)
+            # Picks up what the database filled in while the lock is still held, committing
+            # expires it and reading it after would take the lock a second time
+            session.refresh(word)
+            session.expunge_all()
             session.commit()
-            word = session.scalar(select(Word).where(Word.name == name))
+        if self._title_index is not None:
+            self._title_index.add(name)
+        self._check_key(word.sort_key)
         return word
 
     @staticmethod
@@ -40,7 +236,8 @@ class DBPersistence:
         found_tag_names = {tag.name for tag in tags_from_db}
         created_tags = [Tag(name=t) for t in tags - found_tag_names]
         session.add_all(created_tags)
-        session.commit()
+        # Left to the caller to commit, along with whatever the tags are for
+        session.flush()
         return set(chain(created_tags, tags_from_db))
 
     def update_word(
@@ -61,24 +258,579 @@ class DBPersistence:
             # Might fail due to duplicate key
             self._rename_word(name, new_name)
 
+    @retry_when_locked
     def delete_word(self, name: str):
+        with self._write_session() as session:
+            word = session.execute(select(Word).where(Word.name == name)).unique().scalar_one()
+            session.delete(word)
+            session.commit()
+        if self._title_index is not None:
+            self._title_index.remove(name)
+
+    def delete_words(self, names: Iterable[str]) -> int:
+        """Deletes every word in `names` at once, returns how many there were"""
+        # Listed before any attempt, a retry would find a generator used up
+        return self._delete_words(list(names))
+
+    @retry_when_locked
+    def _delete_words(self, names: list[str]) -> int:
+        selected = Word.name.in_(_json_values(names))
+        with self.writer.begin() as conn:
+            # Read before the words go, the cascade takes their tagging rows with them
+            tag_ids = list(
+                conn.scalars(
+                    select(tagging.c.tag_id)
+                    .distinct()
+                    .join(Word, Word.id == tagging.c.entry_id)
+                    .where(selected)
+                )
+            )
+            deleted = conn.execute(delete(Word).where(selected)).rowcount
+            if tag_ids:
+                conn.execute(orphaned_tags(tag_ids))
+        if self._title_index is not None:
+            for name in names:
+                self._title_index.remove(name)
+        return deleted
+
+    def tag_words(
+        self, names: Iterable[str], add: set[str] | None = None, remove: set[str] | None = None
+    ):
+        """Adds and removes tags on every word in `names` at once"""
+        self._tag_words(list(names), add, remove)
+
+    @retry_when_locked
+    def _tag_words(self, names: list[str], add: set[str] | None, remove: set[str] | None):
+        selected_words = select(Word.id).where(Word.name.in_(_json_values(names)))
+        with self.writer.begin() as conn:
+            if add:
+                added = _json_values(add)
+                # `OR IGNORE` skips what already exists, SQLite can't parse `ON CONFLICT` after a
+                # `SELECT` without a `WHERE`
+                conn.execute(insert(Tag).prefix_with("OR IGNORE").from_select(["name"], added))
+                # Every added tag with every selected word
+                pairs = (
+                    select(Tag.id, Word.id)
+                    .join(Word, Word.id.in_(selected_words))
+                    .where(Tag.name.in_(added))
+                )
+                conn.execute(
+                    insert(tagging)
+                    .prefix_with("OR IGNORE")
+                    .from_select(["tag_id", "entry_id"], pairs)
+                )
+            if remove:
+                removed = select(Tag.id).where(Tag.name.in_(_json_values(remove)))
+                conn.execute(
+                    delete(tagging).where(
+                        tagging.c.tag_id.in_(removed), tagging.c.entry_id.in_(selected_words)
+                    )
+                )
+                conn.execute(orphaned_tags(removed))
+
+    def export_words(self, names: Iterable[str]) -> list[dict]:
+        """The words in `names`, laid out like `examples.yaml` so they can be loaded again"""
+        query = select(Word).where(Word.name.in_(_json_values(names))).order_by(Word.id)
+        with self._get_session() as session:
+            return [
+                {"title": word.name, "words": word.content, "tags": sorted(word.tags)}
+                for word in session.scalars(query)
+            ]
+
+    def find_near_duplicates(
+        self, content: str, threshold: float = SIMILARITY
+    ) -> list[tuple[str, float]]:
+        """
+        The words whose content is at least `threshold` similar to `content`, most similar first.
+
+        Only the words sharing a bucket with it are compared, found through the LSH index.
+        """
+        signature = minhash(content)
+        in_buckets = or_(
+            *(
+                and_(word_lsh.c.band == band, word_lsh.c.bucket == bucket)
+                for band, bucket in band_buckets(signature)
+            )
+        )
+        query = (
+            select(Word.name, Signature.data)
+            .join(Signature, Signature.word_id == Word.id)
+            .where(Word.id.in_(select(word_lsh.c.word_id).where(in_buckets)))
+        )
+        with self.engine.connect() as conn:
+            scored = [
+                (name, similarity(signature, load_signature(data)))
+                for name, data in conn.execute(query)
+            ]
+        matches = [(name, score) for name, score in scored if score >= threshold]
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def duplicate_clusters(self, threshold: float = SIMILARITY) -> list[list[str]]:
+        """Groups of words with near duplicate contents, the biggest groups first"""
+        shared = (
+            select(word_lsh.c.band, word_lsh.c.bucket)
+            .group_by(word_lsh.c.band, word_lsh.c.bucket)
+            .having(func.count() > 1)
+            .subquery()
+        )
+        query = (
+            select(word_lsh.c.band, word_lsh.c.bucket, Word.id, Word.name, Signature.data)
+            .join(
+                shared,
+                and_(word_lsh.c.band == shared.c.band, word_lsh.c.bucket == shared.c.bucket),
+            )
+            .join(Word, Word.id == word_lsh.c.word_id)
+            .join(Signature, Signature.word_id == Word.id)
+        )
+        buckets: dict[tuple[int, int], list[int]] = {}
+        names: dict[int, str] = {}
+        signatures: dict[int, tuple[int, ...]] = {}
+        with self.engine.connect() as conn:
+            for band, bucket, word_id, name, data in conn.execute(query):
+                buckets.setdefault((band, bucket), []).append(word_id)
+                names[word_id] = name
+                if word_id not in signatures:
+                    signatures[word_id] = load_signature(data)
+        pairs = {
+            (first, second)
+            for members in buckets.values()
+            for i, first in enumerate(members)
+            for second in members[i + 1 :]
+        }
+        similar = (
+            pair
+            for pair in pairs
+            if similarity(signatures[pair[0]], signatures[pair[1]]) >= threshold
+        )
+        groups = [sorted(names[word_id] for word_id in group) for group in clusters(similar)]
+        return sorted(groups, key=lambda group: (-len(group), group))
+
+    @property
+    def replica_id(self) -> str:
+        """This library's identity when syncing, see `wordspreader.sync`"""
+        with self.engine.connect() as conn:
+            return conn.scalar(select(replica_table.c.id))
+
+    def sync_with(self, other: DBPersistence) -> SyncResult:
+        """
+        Exchanges changes with another library, after which both have the same words.
+
+        Only `replica_id`, `changes_for`, `apply_changes` and `mark_sent` are used on `other`, so
+        anything offering those, like a sync server, can stand in for a library.
+        """
+        outgoing = self.changes_for(other.replica_id)
+        incoming = other.changes_for(self.replica_id)
+        # Each side's watermark only moves once the changes are in, a failure sends them again
+        theirs = other.apply_changes(outgoing)
+        self.mark_sent(other.replica_id, outgoing.seq)
+        ours = self.apply_changes(incoming)
+        other.mark_sent(self.replica_id, incoming.seq)
+        return SyncResult(
+            sent=len(outgoing.changes),
+            received=len(incoming.changes),
+            conflicts=sorted({*theirs.conflicts, *ours.conflicts}),
+        )
+
+    def changes_for(self, peer: str) -> Changeset:
+        """What changed here since `peer` was last sent anything, oldest first"""
         with self._get_session() as session:
-            word = (
-                session.execute(select(Word).where(Word.name == name).with_for_update())
-                .unique()
-                .scalar_one()
+            # Read first, anything written meanwhile is sent now and again next time, never lost
+            replica, seq = session.execute(select(replica_table.c.id, replica_table.c.seq)).one()
+            sent = self._sent_seq(session, peer)
+            # The peer already has what came from it
+            words = session.scalars(select(Word).where(Word.seq > sent, Word.origin != peer))
+            changed = [
+                (
+                    word.seq,
+                    Change(
+                        word.uid,
+                        word.clock,
+                        word.origin,
+                        word.name,
+                        word.content,
+                        tuple(sorted(word.tags)),
+                    ),
+                )
+                for word in words
+            ]
+            tombstones = session.scalars(
+                select(Tombstone).where(Tombstone.seq > sent, Tombstone.origin != peer)
             )
-            session.delete(word)
+            changed.extend((t.seq, Change(t.uid, t.clock, t.origin)) for t in tombstones)
+        changed.sort(key=lambda pair: pair[0])
+        return Changeset(replica, seq, [change for _, change in changed])
+
+    @retry_when_locked
+    def apply_changes(self, changeset: Changeset) -> SyncResult:
+        """Takes in a peer's changes, keeping whichever version of each word is the newest"""
+        if changeset.replica == self.replica_id:
+            msg = (
+                f"Both libraries are replica `{changeset.replica}`, one was copied from the other "
+                "after it started syncing"
+            )
+            raise ValueError(msg)
+        # Names may change below and buffered uses go by name
+        self.usage.flush()
+        conflicts = []
+        with self._write_session() as session:
+            clock, seq = session.execute(select(replica_table.c.clock, replica_table.c.seq)).one()
+            sent = self._sent_seq(session, changeset.replica)
+            # The changes come with their own stamps, keep the triggers out of it
+            session.execute(update(replica_table).values(applying=True))
+            for change in changeset.changes:
+                clock = max(clock, change.clock)
+                word = session.scalar(select(Word).where(Word.uid == change.uid))
+                local = word or session.get(Tombstone, change.uid)
+                if (
+                    local is not None
+                    and local.seq > sent
+                    and local.origin != changeset.replica
+                    and not self._same_as(word, change)
+                ):
+                    name = change.name or (word.name if word is not None else change.uid)
+                    log.warning("`%s` was changed in both libraries, keeping the newer", name)
+                    conflicts.append(name)
+                if local is not None and (local.clock, local.origin) >= change.version:
+                    continue
+                seq += 1
+                self._apply_change(session, word, change, seq)
+            session.execute(update(replica_table).values(applying=False, clock=clock, seq=seq))
+            session.commit()
+        self._title_index = None
+        return SyncResult(sent=0, received=len(changeset.changes), conflicts=conflicts)
+
+    @retry_when_locked
+    def mark_sent(self, peer: str, seq: int):
+        """Records that `peer` has everything up to `seq`"""
+        with self._write_session() as session:
+            session.merge(SyncPeer(replica=peer, sent_seq=seq))
             session.commit()
 
-    def get_words_filtered(self, category: str | None = None) -> Iterator[Word]:
+    def _apply_change(self, session: Session, word: Word | None, change: Change, seq: int):
+        if change.deleted:
+            if word is not None:
+                session.delete(word)
+            session.merge(Tombstone(change.uid, change.clock, change.origin, seq))
+            session.flush()
+            return
+        name = self._claim_name(session, change.name, change.uid)
+        previous = None
+        if word is None:
+            word = Word(name=name, content=change.content, tags={})
+            word.uid = change.uid
+            # The order is this library's own, words from elsewhere join the end of it
+            word.sort_key = self._append_key(session)
+            session.add(word)
+            # Back from the dead, a newer change than its delete
+            session.execute(delete(Tombstone).where(Tombstone.uid == change.uid))
+        else:
+            previous = word.content
+            word.name = name
+            word.content = change.content
+        word.tag_objs = self.resolve_tags(set(change.tags), session)
+        word.clock, word.origin, word.seq = change.clock, change.origin, seq
+        session.flush()
+        if previous != change.content:
+            self._record_revision(session, word.id, previous, change.content)
+            index_word(session, word.id, change.content)
+
+    @staticmethod
+    def _claim_name(session: Session, name: str, uid: str) -> str:
+        """
+        The name for the word `uid`, which may already be taken by a different word.
+
+        Of the two, the one with the greater uid gives way in every library, so they all agree.
+        """
+        other = session.scalar(select(Word).where(Word.name == name, Word.uid != uid))
+        if other is None:
+            return name
+        if other.uid > uid:
+            other.name = collision_name(other.name, other.uid)
+            session.flush()
+            return name
+        return collision_name(name, uid)
+
+    @staticmethod
+    def _same_as(word: Word | None, change: Change) -> bool:
+        if word is None:
+            return change.deleted
+        current = (word.name, word.content, set(word.tags))
+        return current == (change.name, change.content, set(change.tags))
+
+    @staticmethod
+    def _sent_seq(session: Session, peer: str) -> int:
+        return session.scalar(select(SyncPeer.sent_seq).where(SyncPeer.replica == peer)) or 0
+
+    @property
+    def libraries(self) -> list[str]:
+        """The primary library followed by the aliases of the mounted ones"""
+        return [PRIMARY, *self._libraries]
+
+    def attach_library(self, db_file: Path, alias: str):
+        """
+        Mounts another library file with `ATTACH DATABASE` so it can be read with this one.
+
+        Everything that writes still only goes to this, the primary, library.
+        """
+        if not alias.isidentifier() or alias in ("main", "temp") or alias in self._libraries:
+            msg = f"`{alias}` can't be used as a library name"
+            raise ValueError(msg)
+        # ATTACH would make an empty database rather than fail
+        if not db_file.is_file():
+            msg = f"There is no library at `{db_file}`"
+            raise FileNotFoundError(msg)
+        self._libraries[alias] = db_file.resolve().absolute()
+        try:
+            # Checking out a connection attaches it, so a file that isn't a database fails here
+            with self.engine.connect() as conn:
+                if not inspect(conn).has_table(Word.__tablename__, schema=alias):
+                    msg = f"`{db_file}` isn't a library, it has no words"
+                    raise ValueError(msg)
+        except Exception:
+            del self._libraries[alias]
+            raise
+
+    def detach_library(self, alias: str):
+        del self._libraries[alias]
+        with self.engine.connect():
+            pass
+
+    def get_library_words(self, category: str | None = None) -> Iterator[LibraryWord]:
+        """Words from every mounted library, read in a single statement"""
+        with self.engine.connect() as conn:
+            for row in conn.execute(words_query(self.libraries, category)):
+                yield to_library_word(row)
+
+    def get_library_tags(self) -> Iterator[str]:
+        with self.engine.connect() as conn:
+            yield from conn.execute(tags_query(self.libraries)).scalars()
+
+    def get_name_collisions(self) -> dict[str, list[str]]:
+        """Word names used in more than one library, and the libraries that use them"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(collisions_query(self.libraries))
+            return {name: sorted(libraries.split(SEPARATOR)) for name, libraries in rows}
+
+    def _sync_attached(self, dbapi_connection, connection_record, _connection_proxy):
+        """ATTACH is per connection, bring pooled connections in line as they are checked out"""
+        attached: dict[str, Path] = connection_record.info.setdefault("attached", {})
+        if attached == self._libraries:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for alias in attached.keys() - self._libraries.keys():
+                cursor.execute(f'DETACH DATABASE "{alias}"')
+                del attached[alias]
+            for alias, db_file in self._libraries.items():
+                if attached.get(alias) != db_file:
+                    cursor.execute(f'ATTACH DATABASE ? AS "{alias}"', (str(db_file),))
+                    attached[alias] = db_file
+        finally:
+            cursor.close()
+
+    @property
+    def title_index(self) -> FuzzyIndex:
+        """A fuzzy index of every word's name, built on first use and kept current after that"""
+        if self._title_index is None:
+            with self._get_session() as session:
+                self._title_index = FuzzyIndex(session.scalars(select(Word.name)))
+        return self._title_index
+
+    def search_titles(self, query: str, limit: int = 10) -> list[str]:
+        return self.title_index.search(query, limit)
+
+    def record_use(self, name: str):
+        """Counts a copy of the word, buffered in memory until the next flush"""
+        self.usage.record(name)
+
+    def get_words_filtered(
+        self, category: str | None = None, order_by: ORDER_TYPE = "inserted"
+    ) -> Iterator[Word]:
         query = select(Word)
         if category is not None:
-            query = query.where(Word.tags == category)
+            # Driven from the tag, rather than checking every word for it
+            query = (
+                query.join(tagging, tagging.c.entry_id == Word.id)
+                .join(Tag, Tag.id == tagging.c.tag_id)
+                .where(Tag.name == category)
+            )
+        match order_by:
+            case "inserted":
+                pass
+            case "most_used":
+                self.usage.flush()
+                query = query.order_by(Word.copy_count.desc(), Word.last_used.desc())
+            case "recently_used":
+                self.usage.flush()
+                query = query.order_by(Word.last_used.desc())
+            case "manual":
+                query = query.order_by(Word.pinned.desc(), Word.sort_key, Word.id)
+            case _:
+                msg = f"Invalid order, received `{order_by}` expected one of {ORDER_TYPE.__args__}"
+                raise RuntimeError(msg)
 
         with self._get_session() as session:
             yield from session.scalars(query).unique()
 
+    def get_words_page(self, after: str | None = None, limit: int = PAGE_SIZE) -> list[Word]:
+        """
+        Up to `limit` words in the manual order, starting after the word named `after`.
+
+        Each page picks up from the previous one's last word in the index, however deep it is.
+        """
+        with self._get_session() as session:
+            pinned, key = True, None
+            if after is not None:
+                row = session.execute(
+                    select(Word.pinned, Word.sort_key).where(Word.name == after)
+                ).one_or_none()
+                if row is None:
+                    msg = f"No word named `{after}`"
+                    raise NoResultFound(msg)
+                pinned, key = row
+            words = []
+            # The pinned words, then the rest, each read in order straight from the index
+            for in_list in (True, False) if pinned else (False,):
+                query = (
+                    select(Word)
+                    .where(Word.pinned == in_list)
+                    .order_by(Word.sort_key, Word.id)
+                    .limit(limit - len(words))
+                )
+                if key is not None and in_list == pinned:
+                    query = query.where(Word.sort_key > key)
+                words.extend(session.scalars(query))
+                if len(words) == limit:
+                    break
+            return words
+
+    @retry_when_locked
+    def move_word(self, name: str, after: str | None = None):
+        """
+        Puts the word right after the word named `after` in the manual order, or first for None.
+
+        Only the moved word is written, it gets a sort key between its new neighbours'. Pinned
+        words are only ordered among themselves, as are the rest.
+        """
+        if name == after:
+            return
+        with self.writer.begin() as conn:
+            pinned = conn.scalar(select(Word.pinned).where(Word.name == name))
+            if pinned is None:
+                msg = f"No word named `{name}`"
+                raise NoResultFound(msg)
+            same_list = [Word.pinned == pinned, Word.name != name]
+            before = None
+            if after is not None:
+                row = conn.execute(
+                    select(Word.pinned, Word.sort_key).where(Word.name == after)
+                ).one_or_none()
+                if row is None:
+                    msg = f"No word named `{after}`"
+                    raise NoResultFound(msg)
+                if row.pinned != pinned:
+                    msg = f"`{name}` and `{after}` aren't both pinned or both unpinned"
+                    raise ValueError(msg)
+                before = row.sort_key
+                same_list.append(Word.sort_key > before)
+            following = conn.scalar(
+                select(Word.sort_key).where(*same_list).order_by(Word.sort_key).limit(1)
+            )
+            key = key_between(before, following)
+            conn.execute(update(Word).where(Word.name == name).values(sort_key=key))
+        self._check_key(key)
+
+    @retry_when_locked
+    def pin_word(self, name: str, *, pinned: bool = True):
+        """
+        Pins the word after the other pinned words, unpinning puts it first of the rest.
+
+        Nothing changes if it already was.
+        """
+        with self.writer.begin() as conn:
+            if pinned:
+                key = key_between(self._last_key(conn, pinned=True), None)
+            else:
+                first = conn.scalar(
+                    select(Word.sort_key)
+                    .where(Word.pinned == pinned)
+                    .order_by(Word.sort_key)
+                    .limit(1)
+                )
+                key = key_between(None, first)
+            changed = conn.execute(
+                update(Word)
+                .where(Word.name == name, Word.pinned != pinned)
+                .values(pinned=pinned, sort_key=key)
+            ).rowcount
+            if not changed and conn.scalar(select(Word.id).where(Word.name == name)) is None:
+                msg = f"No word named `{name}`"
+                raise NoResultFound(msg)
+        if changed:
+            self._check_key(key)
+
+    @retry_when_locked
+    def set_templated(self, name: str, *, templated: bool = True):
+        """Turns filling in the word's placeholders when it is copied on or off"""
+        with self.writer.begin() as conn:
+            changed = conn.execute(
+                update(Word).where(Word.name == name).values(templated=templated)
+            ).rowcount
+        if not changed:
+            msg = f"No word named `{name}`"
+            raise NoResultFound(msg)
+
+    @retry_when_locked
+    def rebalance_order(self) -> int:
+        """Spaces out the sort keys evenly again, keeping the order, returns how many there are"""
+        self._rebalance_pending = False
+        rewritten = 0
+        with self.writer.begin() as conn:
+            for pinned in (True, False):
+                ids = conn.scalars(
+                    select(Word.id).where(Word.pinned == pinned).order_by(Word.sort_key, Word.id)
+                ).all()
+                if not ids:
+                    continue
+                conn.execute(
+                    update(Word)
+                    .where(Word.id == bindparam("b_id"))
+                    .values(sort_key=bindparam("b_key")),
+                    [
+                        {"b_id": word_id, "b_key": key}
+                        for word_id, key in zip(ids, spaced_keys(len(ids)), strict=True)
+                    ],
+                )
+                rewritten += len(ids)
+        log.info("Rebalanced the sort keys of %d words", rewritten)
+        return rewritten
+
+    def _check_key(self, key: str):
+        """Has the keys rebalanced in the background once they get long"""
+        if len(key) <= REBALANCE_LENGTH or self._rebalance_pending:
+            return
+        self._rebalance_pending = True
+        self._in_background(self.rebalance_order).add_done_callback(self._rebalanced)
+
+    @staticmethod
+    def _rebalanced(future: Future[int]):
+        if future.exception() is not None:
+            log.error("Failed to rebalance the sort keys", exc_info=future.exception())
+
+    @classmethod
+    def _append_key(cls, conn: Connection | Session) -> str:
+        """A key after every word that isn't pinned"""
+        return key_between(cls._last_key(conn, pinned=False), None)
+
+    @staticmethod
+    def _last_key(conn: Connection | Session, *, pinned: bool) -> str | None:
+        return conn.scalar(
+            select(Word.sort_key)
+            .where(Word.pinned == pinned)
+            .order_by(Word.sort_key.desc())
+            .limit(1)
+        )
+
     def get_word(self, name: str) -> Word:
         with self._get_session() as session:
             return self._get_word(session, name)
@@ -87,42 +839,246 @@ class DBPersistence:
         with self._get_session() as session:
             yield from session.execute(select(Word).where(Word.name.like(name))).unique().scalars()
 
+    def list_revisions(self, name: str) -> list[Revision]:
+        """Every stored revision of the word's content, oldest first"""
+        with self._get_session() as session:
+            word = self._get_word(session, name)
+            if word is None:
+                return []
+            query = select(Revision).where(Revision.word_id == word.id).order_by(Revision.number)
+            return list(session.scalars(query))
+
+    def get_revision(self, name: str, number: int) -> str:
+        """The content of the word as of revision `number`"""
+        with self._get_session() as session:
+            word = self._get_word(session, name)
+            if word is None:
+                msg = f"No word named `{name}`"
+                raise KeyError(msg)
+            return self._rebuild_revision(session, word.id, number)
+
+    def restore_revision(self, name: str, number: int):
+        """Sets the content back to revision `number`, which is recorded as a new revision"""
+        self._update_word(name, content=self.get_revision(name, number))
+
+    @property
+    def compress_threshold(self) -> int:
+        """Content at least this many bytes long is stored compressed, 0 when it is off"""
+        with self.engine.connect() as conn:
+            value = conn.scalar(select(settings.c.value).where(settings.c.name == COMPRESS_SETTING))
+        return int(value or 0)
+
+    def set_compression(
+        self, threshold: int = DEFAULT_COMPRESS_THRESHOLD, *, vacuum: bool = False
+    ) -> int:
+        """
+        Stores content at least `threshold` bytes long compressed from now on, 0 turns it off.
+
+        The words already stored are rewritten to match, `vacuum` gives the freed pages back to
+        the file system. Returns how many words were rewritten.
+        """
+        previous, ddl.COMPRESS_THRESHOLD = ddl.COMPRESS_THRESHOLD, threshold
+        try:
+            rewritten = self._recompress_contents(threshold)
+        except Exception:
+            ddl.COMPRESS_THRESHOLD = previous
+            raise
+        if vacuum:
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql("VACUUM")
+        return rewritten
+
+    @retry_when_locked
+    def _recompress_contents(self, threshold: int) -> int:
+        """Stores the setting and rewrites the content that is stored the other way"""
+        words = Word.__table__
+        storage = func.typeof(words.c.content)
+        if threshold:
+            stale = (storage == "text") & (
+                func.length(cast(words.c.content, LargeBinary)) >= threshold
+            )
+        else:
+            stale = storage == "blob"
+        with self.writer.begin() as conn:
+            conn.execute(
+                insert(settings)
+                .prefix_with("OR REPLACE")
+                .values(name=COMPRESS_SETTING, value=str(threshold))
+            )
+            rows = conn.execute(select(words.c.id, words.c.content).where(stale)).all()
+            if rows:
+                # Only how it is stored changes, not a change to sync, keep the triggers out of it
+                conn.execute(update(replica_table).values(applying=True))
+                conn.execute(
+                    update(words)
+                    .where(words.c.id == bindparam("b_id"))
+                    .values(content=bindparam("b_content", type_=CompressedText())),
+                    [{"b_id": row.id, "b_content": row.content} for row in rows],
+                )
+                conn.execute(update(replica_table).values(applying=False))
+        log.info("Rewrote the content of %d words", len(rows))
+        return len(rows)
+
+    def add_attachment(
+        self,
+        name: str,
+        filename: str,
+        stream: BinaryIO,
+        size: int,
+        media_type: str | None = None,
+    ) -> int:
+        """Attaches `size` bytes read from `stream` to the word, returns the attachment's id"""
+        # Not retried, the stream can't be read again
+        with self.writer.begin() as conn:
+            word_id = conn.scalar(select(Word.id).where(Word.name == name))
+            if word_id is None:
+                msg = f"No word named `{name}`"
+                raise KeyError(msg)
+            return write_attachment(conn, word_id, filename, stream, size, media_type)
+
+    def add_attachment_file(self, name: str, path: Path) -> int:
+        with path.open("rb") as stream:
+            return self.add_attachment(name, path.name, stream, path.stat().st_size)
+
+    def list_attachments(self, name: str) -> list[Attachment]:
+        """The word's attachments without their data"""
+        with self._get_session() as session:
+            query = (
+                select(Attachment)
+                .join(Word, Word.id == Attachment.word_id)
+                .where(Word.name == name)
+                .order_by(Attachment.id)
+            )
+            return list(session.scalars(query))
+
+    def open_attachment(self, attachment_id: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Streams the attachment's data, a chunk at a time"""
+        with self.engine.connect() as conn:
+            yield from read_attachment(conn, attachment_id, chunk_size)
+
+    def export_attachment(self, attachment_id: int, dest: BinaryIO) -> int:
+        """Writes the attachment's data to `dest`, returns how many bytes were written"""
+        written = 0
+        for chunk in self.open_attachment(attachment_id):
+            dest.write(chunk)
+            written += len(chunk)
+        return written
+
+    @retry_when_locked
+    def delete_attachment(self, attachment_id: int):
+        with self.writer.begin() as conn:
+            conn.execute(delete(Attachment).where(Attachment.id == attachment_id))
+
     def get_all_tags(self) -> Iterator[str]:
         with self._get_session() as session:
-            yield from session.execute(select(Tag.name)).scalars()
+            # Ordered by name so it reads straight from the unique index
+            yield from session.execute(select(Tag.name).order_by(Tag.name)).scalars()
 
+    @retry_when_locked
     def _rename_word(self, old_name: str, new_name: str):
         """Changes the primary key"""
-        with self._get_session() as session:
-            maybe_new_word = self._get_word(session, new_name)
-            if maybe_new_word:
-                msg = f'New name: `{new_name}` is already taken, pick another name"'
-                raise DuplicateKeyException(msg)
-            word = self._get_word(session, old_name)
-            word.name = new_name
-            session.add(word)
+        # Buffered uses are keyed by name, get them written before the name goes away
+        self.usage.flush()
+        msg = f'New name: `{new_name}` is already taken, pick another name"'
+        if new_name == old_name:
+            # Taken by itself, which the constraint wouldn't notice
+            raise DuplicateKeyException(msg)
+        with self._write_session() as session:
+            # The unique constraint decides, a check first could be beaten to it by another writer
+            try:
+                renamed = session.execute(
+                    update(Word).where(Word.name == old_name).values(name=new_name)
+                ).rowcount
+            except IntegrityError as e:
+                raise DuplicateKeyException(msg) from e
+            if not renamed:
+                msg = f"No word named `{old_name}`"
+                raise NoResultFound(msg)
             session.commit()
+        if self._title_index is not None:
+            self._title_index.rename(old_name, new_name)
 
+    @retry_when_locked
     def _update_word(self, name: str, content: str | None = None, tags: set[str] | None = None):
         """Doesn't change primary key, just content and/or tags"""
-        with self._get_session() as session:
-            word = self._get_word(session, name, True)
-            if content is not None:
+        with self._write_session() as session:
+            word = self._get_word(session, name)
+            if content is not None and content != word.content:
                 # If it is a str, even empty, we need to assign it, though an empty list evals as falsey
+                self._record_revision(session, word.id, word.content, content)
+                index_word(session, word.id, content)
                 word.content = content
             if tags is not None:
                 # If it is a list, even empty, we need to assign it, though an empty list evals as falsey
-                word.tags = tags
+                # Reuse the tags that already exist, assigning names would try to create them again
+                word.tag_objs = self.resolve_tags(tags, session)
             session.add(word)
             session.commit()
 
     @staticmethod
-    def _get_word(session: Session, name: str, for_update: bool = False) -> Word | None:
-        query = select(Word).where(Word.name == name)
-        if for_update:
-            query.with_for_update()
+    def _record_revision(session: Session, word_id: int, previous: str | None, content: str):
+        """Stores `content` as the next revision, `previous` is the content it is replacing"""
+        latest = session.scalar(
+            select(Revision.number)
+            .where(Revision.word_id == word_id)
+            .order_by(Revision.number.desc())
+            .limit(1)
+        )
+        now = datetime.now(tz=UTC)
+        if latest is None and previous is not None:
+            # Words from before we kept history, save what they had so it isn't lost
+            _, payload = encode_revision(0, None, previous)
+            session.add(
+                Revision(word_id=word_id, number=0, keyframe=True, payload=payload, created=now)
+            )
+            latest = 0
+        number = 0 if latest is None else latest + 1
+        keyframe, payload = encode_revision(number, previous, content)
+        session.add(
+            Revision(
+                word_id=word_id, number=number, keyframe=keyframe, payload=payload, created=now
+            )
+        )
 
+    @staticmethod
+    def _rebuild_revision(session: Session, word_id: int, number: int) -> str:
+        """Replays from the closest keyframe, never more than `KEYFRAME_INTERVAL` revisions"""
+        start = session.scalar(
+            select(Revision.number)
+            .where(
+                Revision.word_id == word_id,
+                Revision.keyframe.is_(True),
+                Revision.number <= number,
+                Revision.number > number - KEYFRAME_INTERVAL,
+            )
+            .order_by(Revision.number.desc())
+            .limit(1)
+        )
+        msg = f"No revision `{number}` for word id `{word_id}`"
+        if start is None:
+            raise KeyError(msg)
+        rows = session.execute(
+            select(Revision.keyframe, Revision.payload)
+            .where(Revision.word_id == word_id, Revision.number.between(start, number))
+            .order_by(Revision.number)
+        ).all()
+        if len(rows) != number - start + 1:
+            raise KeyError(msg)
+        return rebuild(rows)
+
+    @staticmethod
+    def _get_word(session: Session, name: str) -> Word | None:
+        query = select(Word).where(Word.name == name)
         return session.execute(query).unique().scalar_one_or_none()
 
     def _get_session(self) -> Session:
         return Session(self.engine)
+
+    def _write_session(self) -> Session:
+        """
+        A session whose transaction holds the write lock from the start.
+
+        SQLite has no `SELECT ... FOR UPDATE`, this is what keeps what it reads from changing
+        before it writes.
+        """
+        return Session(self.writer)
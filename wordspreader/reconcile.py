@@ -0,0 +1,97 @@
+"""
+Keeps the list's rows in line with the words they show, matched up by word id.
+
+Rows whose word is still there are kept and only rebound, new words get a row from the pool and
+the rows of removed words go back to it. Nothing here touches the page, the caller sends what
+comes out.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Generic, Protocol, TypeVar
+
+from wordspreader.ddl import Word
+
+# Detached rows kept around for reuse, past this they are left to the garbage collector
+POOL_SIZE = 256
+
+
+class Row(Protocol):
+    word_id: int | None
+
+    def rebind(
+        self,
+        word_id: int,
+        title: str,
+        words: str,
+        tags: Iterable[str],
+        *,
+        pinned: bool = False,
+        templated: bool = False,
+    ) -> bool:
+        """Shows the word without sending anything, returns if anything changed"""
+
+
+R = TypeVar("R", bound=Row)
+
+
+@dataclass
+class Reconciled(Generic[R]):
+    # Every row, in the order of the words
+    rows: list[R]
+    # Kept rows whose word changed
+    changed: list[R] = field(default_factory=list)
+    # Rows for words that had none
+    added: list[R] = field(default_factory=list)
+
+
+class RowPool(Generic[R]):
+    def __init__(self, create: Callable[..., R], size: int = POOL_SIZE):
+        """`create` makes a row when the pool is empty, it is called like `row_for`"""
+        self.create = create
+        self.size = size
+        self._rows: list[R] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def row_for(
+        self,
+        word_id: int,
+        title: str,
+        words: str,
+        tags: Iterable[str],
+        *,
+        pinned: bool = False,
+        templated: bool = False,
+    ) -> R:
+        """A row for the word, recycled from the pool when there is one"""
+        if self._rows:
+            row = self._rows.pop()
+            row.rebind(word_id, title, words, tags, pinned=pinned, templated=templated)
+            return row
+        return self.create(word_id, title, words, tags, pinned=pinned, templated=templated)
+
+    def release(self, rows: Iterable[R]):
+        room = self.size - len(self._rows)
+        if room > 0:
+            self._rows.extend(list(rows)[:room])
+
+    def reconcile(self, rows: Iterable[R], words: Iterable[Word]) -> Reconciled[R]:
+        """The rows for `words`, reusing `rows` by word id and releasing the ones left over"""
+        by_id: dict[int | None, R] = {row.word_id: row for row in rows}
+        result: Reconciled[R] = Reconciled([])
+        for word in words:
+            shown = (word.id, word.name, word.content, word.tags)
+            flags = {"pinned": word.pinned, "templated": word.templated}
+            row = by_id.pop(word.id, None)
+            if row is None:
+                row = self.row_for(*shown, **flags)
+                result.added.append(row)
+            elif row.rebind(*shown, **flags):
+                result.changed.append(row)
+            result.rows.append(row)
+        self.release(by_id.values())
+        return result
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+log = logging.getLogger(__name__)
+T = TypeVar("T")
+
+# Wait this long after the last request before refreshing
+DEBOUNCE_DELAY = 0.05
+# But never put a refresh off for longer than this while requests keep coming in
+MAX_DELAY = 0.5
+
+
+class RefreshScheduler(Generic[T]):
+    """
+    Debounces and coalesces refresh requests onto one worker thread.
+
+    Any number of `request` calls close together turn into a single `load`, which does the slow
+    database work on the worker, followed by a single `apply` of what it loaded.
+    Requests that come in while a refresh is running get one more refresh after it.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], T],
+        apply: Callable[[T], None],
+        delay: float = DEBOUNCE_DELAY,
+        max_delay: float = MAX_DELAY,
+    ):
+        self.load = load
+        self.apply = apply
+        self.delay = delay
+        self.max_delay = max_delay
+        self._condition = threading.Condition()
+        self._first_request: float | None = None
+        self._last_request: float | None = None
+        self._running = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="wordspreader-refresh", daemon=True)
+        self._thread.start()
+
+    def request(self):
+        with self._condition:
+            now = time.monotonic()
+            if self._first_request is None:
+                self._first_request = now
+            self._last_request = now
+            self._condition.notify_all()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Blocks until nothing is pending or running, returns False if it timed out"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._first_request is None and not self._running, timeout
+            )
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _due_in(self) -> float:
+        """Seconds until the pending refresh should run, must be called with the lock held"""
+        now = time.monotonic()
+        return min(self._last_request + self.delay, self._first_request + self.max_delay) - now
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._first_request is not None)
+                if self._closed:
+                    return
+                while (due_in := self._due_in()) > 0:
+                    self._condition.wait(due_in)
+                self._first_request = self._last_request = None
+                self._running = True
+            try:
+                self.apply(self.load())
+            except Exception:
+                log.exception("Refresh failed")
+            finally:
+                with self._condition:
+                    self._running = False
+                    self._condition.notify_all()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import logging
+import marshal
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from wordspreader.ddl import Word
+
+log = logging.getLogger(__name__)
+
+# Bump whenever the layout below changes, older snapshots are then ignored
+SNAPSHOT_VERSION = 3
+# Only enough rows to fill the first screen are kept
+FIRST_PAGE = 50
+
+
+@dataclass(frozen=True)
+class SnapshotRow:
+    word_id: int
+    name: str
+    content: str
+    tags: frozenset[str]
+    pinned: bool = False
+    templated: bool = False
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    tags: list[str]
+    rows: list[SnapshotRow]
+
+
+def dump_snapshot(tags: Iterable[str], words: Iterable[Word], limit: int = FIRST_PAGE) -> bytes:
+    rows = []
+    for word in words:
+        if len(rows) >= limit:
+            break
+        row_tags = tuple(sorted(word.tags))
+        rows.append((word.id, word.name, word.content, row_tags, word.pinned, word.templated))
+    return marshal.dumps((SNAPSHOT_VERSION, sorted(tags), rows))
+
+
+def load_snapshot(data: bytes) -> Snapshot | None:
+    try:
+        # Only ever our own file, written by `write_snapshot`
+        match marshal.loads(data):  # noqa: S302
+            case (int() as version, list() as tags, list() as rows) if version == SNAPSHOT_VERSION:
+                return Snapshot(
+                    tags=tags,
+                    rows=[
+                        SnapshotRow(word_id, name, content, frozenset(row_tags), *flags)
+                        for word_id, name, content, row_tags, *flags in rows
+                    ],
+                )
+    except (EOFError, ValueError, TypeError):
+        log.warning("Ignoring a corrupt snapshot")
+        return None
+    log.info("Ignoring a snapshot from another version")
+    return None
+
+
+def write_snapshot(path: Path, data: bytes):
+    """Written next to the real one first, so a crash never leaves half a snapshot behind"""
+    partial = path.with_name(path.name + ".partial")
+    partial.write_bytes(data)
+    partial.replace(path)
+
+
+def read_snapshot(path: Path) -> Snapshot | None:
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    return load_snapshot(data)
@@ -0,0 +1,140 @@
+"""
+Syncing libraries that are edited apart, like copies of one on different machines.
+
+A word has a `uid` that is the same in every library it is synced to, and the `(clock, origin)`
+of its last change, a Lamport clock and the replica that made the change. Triggers stamp every
+local change, tag changes included, and a delete leaves a `Tombstone` behind. A change also
+stamps the row with the local `seq`, so what a peer hasn't seen yet is the range of rows past
+the last `seq` sent to it, read from an index, and the cost of a sync follows the number of
+changes rather than the size of the library.
+
+Whichever of two versions has the greater `(clock, origin)` wins, so every library settles on the
+same one regardless of the order they sync in.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+
+from sqlalchemy import Boolean, Column, Integer, MetaData, String, Table, insert, select
+from sqlalchemy.engine import Connection
+
+from wordspreader.ddl import new_uid
+
+log = logging.getLogger(__name__)
+
+# Bump whenever the layout of a dumped changeset changes
+CHANGESET_VERSION = 1
+
+# This library's identity and counters, a single row. Kept out of `Base.metadata` for the same
+# reason as the schema version, clearing the app's tables must not give it a new identity.
+replica_table = Table(
+    "sync_replica",
+    MetaData(),
+    Column("id", String(32), primary_key=True),
+    Column("clock", Integer, nullable=False),
+    Column("seq", Integer, nullable=False),
+    # Set while applying a peer's changes, which carry their own stamps
+    Column("applying", Boolean, nullable=False),
+)
+
+_STAMP = """
+UPDATE sync_replica SET clock = clock + 1, seq = seq + 1;
+UPDATE words SET
+    clock = (SELECT clock FROM sync_replica),
+    origin = (SELECT id FROM sync_replica),
+    seq = (SELECT seq FROM sync_replica)
+WHERE id = {word_id};
+"""
+_TOMBSTONE = """
+UPDATE sync_replica SET clock = clock + 1, seq = seq + 1;
+INSERT OR REPLACE INTO tombstone (uid, clock, origin, seq)
+SELECT OLD.uid, clock, id, seq FROM sync_replica;
+"""
+# Trigger name -> (what fires it, what it does). Usage counters aren't synced, so only changes
+# to the name and content count.
+TRIGGERS = {
+    "words_stamp_insert": ("AFTER INSERT ON words", _STAMP.format(word_id="NEW.id")),
+    "words_stamp_update": (
+        "AFTER UPDATE OF name, content ON words",
+        _STAMP.format(word_id="NEW.id"),
+    ),
+    "words_stamp_delete": ("AFTER DELETE ON words", _TOMBSTONE),
+    "tagging_stamp_insert": ("AFTER INSERT ON tagging", _STAMP.format(word_id="NEW.entry_id")),
+    "tagging_stamp_delete": ("AFTER DELETE ON tagging", _STAMP.format(word_id="OLD.entry_id")),
+}
+
+
+@dataclass(frozen=True)
+class Change:
+    uid: str
+    clock: int
+    origin: str
+    # The rest are None for a deleted word
+    name: str | None = None
+    content: str | None = None
+    tags: tuple[str, ...] = ()
+
+    @property
+    def version(self) -> tuple[int, str]:
+        return self.clock, self.origin
+
+    @property
+    def deleted(self) -> bool:
+        return self.name is None
+
+
+@dataclass(frozen=True)
+class Changeset:
+    # The library the changes come from, and its `seq` when they were read
+    replica: str
+    seq: int
+    changes: list[Change] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    sent: int
+    received: int
+    # Names of the words changed on both sides since they last synced
+    conflicts: list[str]
+
+
+def install(conn: Connection):
+    """Makes sure the replica row and the stamping triggers exist, safe to run on every start"""
+    replica_table.create(conn, checkfirst=True)
+    if conn.scalar(select(replica_table.c.id)) is None:
+        conn.execute(insert(replica_table).values(id=new_uid(), clock=0, seq=0, applying=False))
+    for name, (event, body) in TRIGGERS.items():
+        # All of it comes from `TRIGGERS`, nothing from outside
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {event} "  # noqa: S608
+            f"WHEN NOT (SELECT applying FROM sync_replica) BEGIN {body} END"
+        )
+
+
+def dump_changeset(changeset: Changeset) -> bytes:
+    """For carrying a changeset between machines, as a file or to a server"""
+    return json.dumps([CHANGESET_VERSION, asdict(changeset)]).encode("utf-8")
+
+
+def load_changeset(data: bytes) -> Changeset:
+    match json.loads(data):
+        case [int() as version, {"replica": str(), "seq": int(), "changes": list()} as changeset]:
+            if version != CHANGESET_VERSION:
+                msg = f"Changeset version {version} isn't supported, expected {CHANGESET_VERSION}"
+                raise ValueError(msg)
+            changes = [
+                Change(**change | {"tags": tuple(change["tags"])})
+                for change in changeset["changes"]
+            ]
+            return Changeset(replica=changeset["replica"], seq=changeset["seq"], changes=changes)
+    msg = "Not a changeset"
+    raise ValueError(msg)
+
+
+def collision_name(name: str, uid: str) -> str:
+    """What the word that loses a name to another one is renamed to, the same everywhere"""
+    return f"{name} ({uid[:8]})"
@@ -0,0 +1,112 @@
+"""
+Placeholders filled in when a word is copied.
+
+Only words marked as templates are filled in, see `Word.templated`, every other word copies
+exactly as it was written, braces and all. Nothing is marked until the user asks for it.
+
+`{date}`, `{time}`, `{datetime}` and `{title}` are filled in automatically, any other `{field}`
+is asked for when copying. In a template `{{` and `}}` are literal braces, and braces that don't
+form a placeholder are left alone.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime
+
+# Names start with a letter and may have spaces or dashes inside, like `{customer name}`
+PLACEHOLDER = re.compile(r"\{\{|\}\}|\{([A-Za-z_](?:[\w \-]{0,48}\w)?)\}")
+BUILTINS = ("date", "time", "datetime", "title")
+# Compiled templates kept around, least recently copied are dropped first
+CACHE_SIZE = 512
+
+
+@dataclass(frozen=True)
+class Template:
+    # Each literal is followed by the field to put after it, the last one by None
+    parts: tuple[tuple[str, str | None], ...]
+    # The fields the user has to fill in, in the order they first appear
+    prompts: tuple[str, ...]
+    # If any `{{` or `}}` was turned into a single brace
+    escapes: bool = False
+
+    @property
+    def is_plain(self) -> bool:
+        """Rendering gives back the content as is, so there is no need to"""
+        return len(self.parts) == 1 and self.parts[0][1] is None and not self.escapes
+
+    def render(self, values: Mapping[str, str]) -> str:
+        return "".join(
+            literal if field is None else literal + values[field] for literal, field in self.parts
+        )
+
+
+def compile_template(content: str) -> Template:
+    parts = []
+    prompts = []
+    literal = []
+    position = 0
+    escapes = False
+    for match in PLACEHOLDER.finditer(content):
+        literal.append(content[position : match.start()])
+        position = match.end()
+        field = match.group(1)
+        if field is None:
+            # An escaped brace
+            literal.append(match.group()[0])
+            escapes = True
+            continue
+        parts.append(("".join(literal), field))
+        literal = []
+        if field not in BUILTINS and field not in prompts:
+            prompts.append(field)
+    literal.append(content[position:])
+    parts.append(("".join(literal), None))
+    return Template(parts=tuple(parts), prompts=tuple(prompts), escapes=escapes)
+
+
+def builtin_values(title: str, now: datetime | None = None) -> dict[str, str]:
+    now = now or datetime.now().astimezone()
+    return {
+        "date": now.strftime("%x"),
+        "time": now.strftime("%X"),
+        "datetime": now.strftime("%c"),
+        "title": title,
+    }
+
+
+class TemplateCache:
+    """Compiled templates by word id, recompiled only when that word's content changes"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # word id -> (content hash, compiled)
+        self._templates: OrderedDict[int, tuple[bytes, Template]] = OrderedDict()
+
+    def get(self, word_id: int, content: str) -> Template:
+        digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._templates.get(word_id)
+            if cached is not None and cached[0] == digest:
+                self._templates.move_to_end(word_id)
+                return cached[1]
+        template = compile_template(content)
+        with self._lock:
+            self._templates[word_id] = (digest, template)
+            self._templates.move_to_end(word_id)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template
+
+    def discard(self, word_id: int):
+        with self._lock:
+            self._templates.pop(word_id, None)
+
+    def __len__(self) -> int:
+        return len(self._templates)
@@ -0,0 +1,107 @@
+"""
+Transactions that hold up with several writers on one database file.
+
+SQLite takes its write lock at the first write of a deferred transaction, and if another
+connection got there first it fails straight away with "database is locked", the busy timeout
+can't help as waiting could deadlock. Writers begin with `BEGIN IMMEDIATE` instead, taking the
+lock up front where the busy timeout does apply, so they queue rather than fail. Readers don't
+begin a transaction at all, as before, each statement reads on its own and they never wait on
+each other.
+
+`BEGIN IMMEDIATE` locks every database attached to the connection, not only the main one, so
+writers need connections of their own that never have the other libraries attached, or each write
+would lock the other teams out of their own files.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import random
+import sqlite3
+import time
+from collections.abc import Callable
+from typing import ParamSpec, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+log = logging.getLogger(__name__)
+
+# How long a statement waits on another connection's lock before giving up, in seconds
+BUSY_TIMEOUT = 5.0
+# A write that still finds the database locked after the busy timeout is tried this many times
+WRITE_ATTEMPTS = 3
+# The first wait between attempts, doubled each time, in seconds
+RETRY_DELAY = 0.1
+# Execution option picking how a transaction begins
+BEGIN_OPTION = "wordspreader_begin"
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def _configure_connection(dbapi_connection, _connection_record):
+    # Leaves beginning transactions to us, the driver would begin them deferred before writes
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+    cursor.close()
+
+
+def _begin(conn: Connection):
+    mode = conn.get_execution_options().get(BEGIN_OPTION)
+    if mode is not None:
+        conn.exec_driver_sql(f"BEGIN {mode}")
+
+
+def configure_transactions(engine: Engine, writer: Engine | None = None) -> Engine:
+    """
+    Sets up the transactions of `engine` and of `writer`, which writes go through, returns the
+    engine writers should use.
+
+    Without a `writer` the writes share `engine`'s connections.
+    """
+    writer = writer or engine
+    for target in dict.fromkeys((engine, writer)):
+        event.listen(target, "connect", _configure_connection)
+        event.listen(target, "begin", _begin)
+    return writer.execution_options(**{BEGIN_OPTION: "IMMEDIATE"})
+
+
+def is_locked(error: OperationalError) -> bool:
+    code = getattr(error.orig, "sqlite_errorcode", None)
+    # The extended codes keep the primary one in the low byte
+    return code is not None and code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def retry_when_locked(method: Callable[P, R]) -> Callable[P, R]:
+    """
+    Runs the write again when it gave up waiting on the lock, backing off a little more each time.
+
+    Only for writes done in a single transaction, a failed one was rolled back in full.
+    """
+
+    @functools.wraps(method)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                return method(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == WRITE_ATTEMPTS or not is_locked(e):
+                    raise
+                # Jittered, so writers that collided don't collide again
+                delay = RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)  # noqa: S311
+                log.warning(
+                    "`%s` found the database locked, attempt %d of %d, retrying in %.2fs",
+                    method.__name__,
+                    attempt,
+                    WRITE_ATTEMPTS,
+                    delay,
+                )
+                time.sleep(delay)
+        msg = "unreachable"
+        raise AssertionError(msg)
+
+    return wrapper
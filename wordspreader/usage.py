@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import UTC, datetime
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.engine import Engine
+
+from wordspreader.ddl import Word
+
+log = logging.getLogger(__name__)
+
+
+class UsageTracker:
+    """
+    Buffers copy counts and last used timestamps in memory, written to the database in batches.
+
+    Recording a use only touches a dict under a lock, so a copy click never waits on the disk.
+    """
+
+    def __init__(self, engine: Engine, flush_interval: float | None = None):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # name -> (uses since last flush, most recent use)
+        self._pending: dict[str, tuple[int, datetime]] = {}
+        self._timer: threading.Timer | None = None
+
+    def record(self, name: str, when: datetime | None = None):
+        when = when or datetime.now(tz=UTC)
+        with self._lock:
+            count, _ = self._pending.get(name, (0, when))
+            self._pending[name] = (count + 1, when)
+            self._schedule()
+
+    @property
+    def pending(self) -> dict[str, int]:
+        with self._lock:
+            return {name: count for name, (count, _) in self._pending.items()}
+
+    def flush(self) -> int:
+        """Writes all of the buffered uses in one batch, returns how many words were touched"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return 0
+        stmt = (
+            update(Word.__table__)
+            .where(Word.__table__.c.name == bindparam("b_name"))
+            .values(
+                copy_count=Word.__table__.c.copy_count + bindparam("b_count"),
+                last_used=bindparam("b_last_used"),
+            )
+        )
+        params = [
+            {"b_name": name, "b_count": count, "b_last_used": when}
+            for name, (count, when) in batch.items()
+        ]
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(stmt, params)
+        except Exception:
+            # Put the uses back so the next flush picks them up
+            with self._lock:
+                for name, (count, when) in batch.items():
+                    newer_count, newer_when = self._pending.get(name, (0, when))
+                    self._pending[name] = (count + newer_count, max(when, newer_when))
+            raise
+        log.debug("Flushed usage for %d words", len(batch))
+        return len(batch)
+
+    def close(self):
+        self.flush()
+
+    def _schedule(self):
+        """Must be called with the lock held"""
+        if self.flush_interval is None or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            log.exception("Failed to flush usage counters, will retry on the next use")